@@ -0,0 +1,62 @@
+"""Бэкенд SQLite, настроенный под параллельную нагрузку.
+
+По умолчанию база SQLite работает с журналом отката: писатель
+блокирует читателей, а запись, начатая в транзакции после чтения,
+сразу получает "database is locked" вместо ожидания. Здесь каждое новое
+соединение выполняет PRAGMA из SQLITE_PRAGMAS:
+
+- journal_mode=WAL - читатели не ждут писателя, запись идёт в журнал;
+- synchronous=NORMAL - в режиме WAL fsync только при checkpoint,
+  данные не теряются при падении процесса, только при падении ОС;
+- busy_timeout - ожидание блокировки вместо немедленной ошибки;
+- mmap_size и cache_size - чтение страниц из отображённого файла
+  и больший кэш страниц на соединение.
+
+Транзакции atomic() начинаются с BEGIN SQLITE_TRANSACTION_MODE.
+IMMEDIATE берёт блокировку записи сразу: транзакция, которая сначала
+читает, а потом пишет (pre_save, get_or_create), ждёт в busy_timeout,
+а не падает на переходе от чтения к записи.
+
+Соединение держится CONN_MAX_AGE секунд (см. settings), поэтому
+PRAGMA выполняются один раз на соединение, а не на каждый запрос.
+
+    DATABASES = {'default': {'ENGINE': 'core.backends.sqlite3', ...}}
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 2 ** 20,
+    'cache_size': -64 * 1024,
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+def get_pragmas():
+    return getattr(settings, 'SQLITE_PRAGMAS', PRAGMAS)
+
+
+def get_transaction_mode():
+    mode = getattr(settings, 'SQLITE_TRANSACTION_MODE', 'IMMEDIATE')
+    if mode not in TRANSACTION_MODES:
+        raise ValueError(f'SQLITE_TRANSACTION_MODE: {mode}')
+    return mode
+
+
+def apply_pragmas(dbapi_connection, pragmas):
+    """Выполняет PRAGMA на соединении sqlite3."""
+    for name, value in pragmas.items():
+        dbapi_connection.execute(f'PRAGMA {name}={value}')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        apply_pragmas(connection, get_pragmas())
+        return connection
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {get_transaction_mode()}')
@@ -0,0 +1,68 @@
+"""Общие помощники команд замера производительности."""
+import json
+import platform
+import statistics
+import subprocess
+import sys
+
+import django
+from django.conf import settings
+from django.utils import timezone
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(samples, percent):
+    """Перцентиль по ближайшему рангу; samples не обязаны быть сортированы."""
+    ordered = sorted(samples)
+    index = max(0, -(-len(ordered) * percent // 100) - 1)
+    return ordered[index]
+
+
+def summarize(samples, digits=3):
+    """Сводка ряда замеров: min, перцентили, max и среднее."""
+    if not samples:
+        return {}
+    summary = {'min': min(samples)}
+    for percent in PERCENTILES:
+        summary[f'p{percent}'] = percentile(samples, percent)
+    summary['max'] = max(samples)
+    summary['mean'] = statistics.mean(samples)
+    return {name: round(value, digits) for name, value in summary.items()}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    """Сведения о прогоне, по которым сравнивают результаты."""
+    return {
+        'revision': git_revision(),
+        'created': timezone.now().isoformat(),
+        'python': sys.version.split()[0],
+        'django': django.get_version(),
+        'platform': platform.platform(),
+    }
+
+
+def write_results(results, path=None, stream=None):
+    """Пишет результаты в JSON-файл path или в stream."""
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if path:
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text + '\n')
+    else:
+        stream.write(text)
+
+
+def load_results(path):
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
@@ -0,0 +1,316 @@
+"""Кэш в файле SQLite, общий для всех процессов на одной машине.
+
+LocMemCache у каждого воркера свой: одна и та же страница кэшируется
+в каждом процессе отдельно. Здесь записи лежат в одном файле в режиме
+WAL - читатели не ждут писателя, каждая операция идёт одной
+транзакцией. Объём ограничен числом записей (MAX_ENTRIES) и размером
+в байтах (MAX_SIZE); при переполнении удаляются давно читанные записи
+(LRU). Время чтения записи обновляется не чаще раза в TOUCH_INTERVAL
+секунд, чтобы частые чтения не превращались в запись.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': '/var/tmp/yatube-cache.sqlite3',
+            'OPTIONS': {'MAX_ENTRIES': 100000, 'MAX_SIZE': 256 * 2 ** 20},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_SIZE = 64 * 2 ** 20
+TOUCH_INTERVAL = 1.0
+BUSY_TIMEOUT = 5.0
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS cache_entries (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        expires REAL,
+        accessed REAL NOT NULL,
+        size INTEGER NOT NULL
+    )""",
+    """CREATE INDEX IF NOT EXISTS cache_entries_accessed
+        ON cache_entries (accessed)""",
+    """CREATE TABLE IF NOT EXISTS cache_totals (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        entries INTEGER NOT NULL,
+        size INTEGER NOT NULL
+    )""",
+    "INSERT OR IGNORE INTO cache_totals VALUES (0, 0, 0)",
+    """CREATE TRIGGER IF NOT EXISTS cache_entries_ai
+    AFTER INSERT ON cache_entries BEGIN
+        UPDATE cache_totals
+        SET entries = entries + 1, size = size + new.size;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cache_entries_ad
+    AFTER DELETE ON cache_entries BEGIN
+        UPDATE cache_totals
+        SET entries = entries - 1, size = size - old.size;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS cache_entries_au
+    AFTER UPDATE OF size ON cache_entries BEGIN
+        UPDATE cache_totals SET size = size - old.size + new.size;
+    END""",
+]
+
+UPSERT_SQL = """
+    INSERT INTO cache_entries (key, value, expires, accessed, size)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (key) DO UPDATE SET
+        value = excluded.value, expires = excluded.expires,
+        accessed = excluded.accessed, size = excluded.size
+"""
+
+
+def _encode(value, protocol):
+    # Целые числа хранятся как есть, чтобы incr() шёл одним UPDATE.
+    if type(value) is int and -2 ** 63 <= value < 2 ** 63:
+        return value, 8
+    data = pickle.dumps(value, protocol)
+    return data, len(data)
+
+
+def _decode(value):
+    if isinstance(value, int):
+        return value
+    return pickle.loads(value)
+
+
+def _expired(expires, now):
+    return expires is not None and expires <= now
+
+
+@contextmanager
+def _write(connection):
+    """Транзакция записи. BEGIN IMMEDIATE сразу берёт блокировку, и
+    параллельные писатели ждут друг друга, а не падают с SQLITE_BUSY
+    при попытке повысить блокировку чтения."""
+    connection.execute('BEGIN IMMEDIATE')
+    try:
+        yield
+    except BaseException:
+        connection.execute('ROLLBACK')
+        raise
+    connection.execute('COMMIT')
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        options = {'MAX_ENTRIES': DEFAULT_MAX_ENTRIES,
+                   **params.get('OPTIONS', {})}
+        super().__init__({**params, 'OPTIONS': options})
+        self.location = str(location)
+        self._max_size = int(options.get('MAX_SIZE', DEFAULT_MAX_SIZE))
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+
+    def _connection(self):
+        """Своё соединение у каждого потока; после fork - новое."""
+        pid = os.getpid()
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == pid:
+            return connection
+        directory = os.path.dirname(self.location)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(
+            self.location, timeout=BUSY_TIMEOUT, isolation_level=None,
+            check_same_thread=False,
+        )
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        with self._schema_lock:
+            with _write(connection):
+                for sql in SCHEMA:
+                    connection.execute(sql)
+        self._local.connection = connection
+        self._local.pid = pid
+        return connection
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _set(self, connection, key, value, timeout, now):
+        data, size = _encode(value, self.pickle_protocol)
+        connection.execute(UPSERT_SQL, (
+            key, data, self.get_backend_timeout(timeout), now, size))
+
+    def _cull(self, connection, now):
+        """Вытесняет записи, пока кэш не уложится в лимиты.
+
+        Как и в других бэкендах Django, при переполнении удаляется
+        1/CULL_FREQUENCY лимита: сначала просроченные, затем давно
+        читанные записи.
+        """
+        entries, size = connection.execute(
+            'SELECT entries, size FROM cache_totals').fetchone()
+        if entries <= self._max_entries and size <= self._max_size:
+            return
+        connection.execute(
+            'DELETE FROM cache_entries WHERE expires <= ?', (now,))
+        entries, size = connection.execute(
+            'SELECT entries, size FROM cache_totals').fetchone()
+        need_entries = need_size = 0
+        if entries > self._max_entries:
+            need_entries = entries - self._max_entries + (
+                self._max_entries // self._cull_frequency)
+        if size > self._max_size:
+            need_size = size - self._max_size + (
+                self._max_size // self._cull_frequency)
+        victims = []
+        rows = connection.execute(
+            'SELECT key, size FROM cache_entries ORDER BY accessed')
+        for key, entry_size in rows:
+            if len(victims) >= need_entries and need_size <= 0:
+                break
+            victims.append((key,))
+            need_size -= entry_size
+        rows.close()
+        connection.executemany(
+            'DELETE FROM cache_entries WHERE key = ?', victims)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        now = time.time()
+        with _write(connection):
+            row = connection.execute(
+                'SELECT expires FROM cache_entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and not _expired(row[0], now):
+                return False
+            self._set(connection, key, value, timeout, now)
+            self._cull(connection, now)
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        return self._get_many([key]).get(key, default)
+
+    def _get_many(self, keys):
+        connection = self._connection()
+        now = time.time()
+        placeholders = ', '.join('?' * len(keys))
+        rows = connection.execute(
+            'SELECT key, value, expires, accessed FROM cache_entries '
+            f'WHERE key IN ({placeholders})', keys,
+        ).fetchall()
+        found, expired, stale = {}, [], []
+        for key, value, expires, accessed in rows:
+            if _expired(expires, now):
+                expired.append(key)
+                continue
+            found[key] = _decode(value)
+            if accessed < now - TOUCH_INTERVAL:
+                stale.append(key)
+        if expired or stale:
+            with _write(connection):
+                connection.executemany(
+                    'DELETE FROM cache_entries '
+                    'WHERE key = ? AND expires <= ?',
+                    [(key, now) for key in expired],
+                )
+                connection.executemany(
+                    'UPDATE cache_entries SET accessed = ? WHERE key = ?',
+                    [(now, key) for key in stale],
+                )
+        return found
+
+    def get_many(self, keys, version=None):
+        if not keys:
+            return {}
+        made = {self._key(key, version): key for key in keys}
+        found = self._get_many(list(made))
+        return {made[key]: value for key, value in found.items()}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        now = time.time()
+        with _write(connection):
+            self._set(connection, key, value, timeout, now)
+            self._cull(connection, now)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        items = [(self._key(key, version), value)
+                 for key, value in data.items()]
+        connection = self._connection()
+        now = time.time()
+        with _write(connection):
+            for key, value in items:
+                self._set(connection, key, value, timeout, now)
+            self._cull(connection, now)
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        now = time.time()
+        with _write(connection):
+            cursor = connection.execute(
+                'UPDATE cache_entries SET expires = ? '
+                'WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.get_backend_timeout(timeout), key, now),
+            )
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        now = time.time()
+        with _write(connection):
+            row = connection.execute(
+                'SELECT value, expires FROM cache_entries WHERE key = ?',
+                (key,),
+            ).fetchone()
+            if row is None or _expired(row[1], now):
+                raise ValueError(f"Key '{key}' not found")
+            try:
+                value = _decode(row[0]) + delta
+            except TypeError:
+                raise ValueError(f"Key '{key}' is not a number")
+            data, size = _encode(value, self.pickle_protocol)
+            connection.execute(
+                'UPDATE cache_entries SET value = ?, size = ?, accessed = ? '
+                'WHERE key = ?', (data, size, now, key),
+            )
+        return value
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        connection = self._connection()
+        with _write(connection):
+            connection.execute(
+                'DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def delete_many(self, keys, version=None):
+        keys = [(self._key(key, version),) for key in keys]
+        connection = self._connection()
+        with _write(connection):
+            connection.executemany(
+                'DELETE FROM cache_entries WHERE key = ?', keys)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        row = self._connection().execute(
+            'SELECT expires FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        return row is not None and not _expired(row[0], time.time())
+
+    def clear(self):
+        connection = self._connection()
+        with _write(connection):
+            connection.execute('DELETE FROM cache_entries')
@@ -0,0 +1,114 @@
+"""Чтение с реплики, запись в основную базу.
+
+ReplicaMiddleware отправляет чтения безопасных запросов (GET, HEAD,
+OPTIONS) на базу DATABASE_REPLICA, остальные запросы целиком идут в
+default. Реплика отстаёт от основной базы, поэтому после первой
+записи в небезопасном запросе пользователь получает cookie PIN_COOKIE
+и до конца сессии браузера читает из default: свои посты, комментарии
+и подписки он видит сразу. Попутные записи GET-запросов (kvstore
+миниатюр и т. п.) не закрепляют. Сессии всегда читаются из default,
+иначе вход, ещё не попавший на реплику, терялся бы.
+
+Данные, которые кэшируются надолго и сбрасываются сигналами после
+коммита (страницы versioned_cache_page, массивы follow_graph, ленты с
+ETag по версии области), читаются внутри use_primary(): иначе отставшая
+реплика записала бы в кэш старые строки уже под новой версией.
+
+Репликой может служить копия SQLite, которую sync_replica обновляет
+через backup API.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = 'db_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PRIMARY_ONLY_APPS = {'sessions'}
+
+_state = threading.local()
+
+
+def replica_alias():
+    """Псевдоним реплики или None, если реплика не настроена."""
+    alias = getattr(settings, 'DATABASE_REPLICA', None)
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def use_primary():
+    """Чтения внутри блока идут в default, даже в GET-запросе."""
+    use_replica = getattr(_state, 'use_replica', False)
+    _state.use_replica = False
+    try:
+        yield
+    finally:
+        _state.use_replica = use_replica
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if (getattr(_state, 'use_replica', False)
+                and model._meta.app_label not in PRIMARY_ONLY_APPS):
+            return replica_alias()
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Объект, прочитанный с реплики, всё равно пишется в default.
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Реплика - копия default и миграций не получает.
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """Выбирает базу для чтений запроса и закрепляет писавших за default.
+
+    Стоит перед SessionMiddleware, чтобы запись сессии при входе тоже
+    считалась записью.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pinned = PIN_COOKIE in request.COOKIES
+        _state.use_replica = (
+            replica_alias() is not None
+            and request.method in SAFE_METHODS
+            and not pinned
+        )
+        _state.wrote = False
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = _state.wrote
+            _state.use_replica = _state.wrote = False
+        if (wrote and request.method not in SAFE_METHODS and not pinned
+                and replica_alias() is not None):
+            response.set_cookie(PIN_COOKIE, '1', httponly=True,
+                                samesite='Lax')
+        return response
+
+
+def sync_replica(alias=None):
+    """Копирует default в реплику SQLite через backup API.
+
+    Копия пишется страницами под блокировкой реплики, поэтому её
+    читатели видят либо прежнее, либо новое состояние целиком.
+    """
+    alias = alias or replica_alias()
+    if alias is None:
+        raise ValueError('Реплика не настроена (DATABASE_REPLICA)')
+    source, target = connections[DEFAULT_DB_ALIAS], connections[alias]
+    if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+        raise ValueError('backup API есть только у SQLite')
+    source.ensure_connection()
+    target.ensure_connection()
+    source.connection.backup(target.connection)
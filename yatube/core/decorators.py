@@ -0,0 +1,54 @@
+import functools
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryCounter:
+    """execute_wrapper, считающий запросы к базе."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def query_budget(max_queries):
+    """Ограничивает число запросов к базе, которое делает view.
+
+    Считаются запросы ко всем базам, в том числе к реплике.
+
+    При превышении пишет предупреждение в лог, а при
+    QUERY_BUDGET_STRICT = True бросает QueryBudgetExceeded.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            counter = QueryCounter()
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(counter))
+                response = view(request, *args, **kwargs)
+            if counter.count > max_queries:
+                message = (
+                    f'{view.__module__}.{view.__name__}: '
+                    f'{counter.count} запросов при бюджете {max_queries} '
+                    f'({request.get_full_path()})'
+                )
+                if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
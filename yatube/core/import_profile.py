@@ -0,0 +1,102 @@
+"""Время импорта модулей при старте процесса.
+
+Цель запускается в отдельном интерпретаторе с python -X importtime:
+в текущем процессе всё уже импортировано. Строки вида
+
+    import time: self [us] | cumulative | imported package
+
+разбираются в записи по модулям; при нескольких запусках берётся
+медиана, потому что первый запуск платит за холодный кэш файлов.
+
+importtime не видит модули, которые Django грузит через
+importlib.import_module (настройки, apps.py и models.py приложений):
+их собственное время в отчёт не попадает, а импорты внутри - попадают.
+"""
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+
+TARGETS = {
+    # Воркер gunicorn/uWSGI: wsgi.py вместе с прогревом core.warmup
+    'wsgi': 'import yatube.wsgi',
+    # manage.py до запуска команды: настройка Django и приложений
+    'manage': 'import django; django.setup()',
+    # Маршруты, view и формы, которые грузятся на первом запросе
+    'urls': 'import django; django.setup(); import yatube.urls',
+}
+PROJECT_PACKAGES = ('about', 'core', 'posts', 'users', 'yatube')
+
+
+def parse(stderr):
+    """Записи importtime: [(модуль, собственное, полное время, мкс)]."""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        records.append((name.strip(), int(own), int(cumulative)))
+    return records
+
+
+def run(code, env=None):
+    """Время импорта в новом интерпретаторе: {модуль: (own, cumulative)}."""
+    environ = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'yatube.settings',
+               **(env or {})}
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=settings.BASE_DIR, env=environ, capture_output=True, text=True,
+    )
+    if completed.returncode:
+        raise RuntimeError(completed.stderr.strip().splitlines()[-1])
+    return {name: (own, cumulative)
+            for name, own, cumulative in parse(completed.stderr)}
+
+
+def profile(code, repeat=3, env=None):
+    """Медианы по repeat запускам: {модуль: (own, cumulative)}."""
+    runs = [run(code, env) for _ in range(repeat)]
+    names = set().union(*runs)
+    return {
+        name: tuple(
+            statistics.median(values[name][index] for values in runs
+                              if name in values)
+            for index in (0, 1))
+        for name in names
+    }
+
+
+def is_project(name):
+    return name.split('.')[0] in PROJECT_PACKAGES
+
+
+def summarize(modules, limit=20):
+    """Итог, самые дорогие модули и пакеты верхнего уровня."""
+    packages = {}
+    for name, (own, _) in modules.items():
+        package = name.split('.')[0]
+        packages[package] = packages.get(package, 0) + own
+    by_cumulative = sorted(
+        modules.items(), key=lambda item: item[1][1], reverse=True)
+    return {
+        'total_ms': round(sum(own for own, _ in modules.values()) / 1000, 1),
+        'modules': [
+            {'module': name, 'self_ms': round(own / 1000, 2),
+             'cumulative_ms': round(cumulative / 1000, 2),
+             'project': is_project(name)}
+            for name, (own, cumulative) in by_cumulative[:limit]
+        ],
+        'project': [
+            {'module': name, 'self_ms': round(own / 1000, 2),
+             'cumulative_ms': round(cumulative / 1000, 2)}
+            for name, (own, cumulative) in by_cumulative
+            if is_project(name)
+        ][:limit],
+        'packages': [
+            {'package': package, 'self_ms': round(own / 1000, 2)}
+            for package, own in sorted(
+                packages.items(), key=lambda item: -item[1])[:limit]
+        ],
+    }
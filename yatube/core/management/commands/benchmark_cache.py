@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+from core.cache import SQLiteCache
+
+BACKENDS = ('locmem', 'filebased', 'sqlite')
+VALUE_SIZES = {'small': 100, 'page': 16 * 1024}
+MANY_KEYS = 10
+
+
+def make_cache(name, directory):
+    params = {'OPTIONS': {'MAX_ENTRIES': 100000}}
+    if name == 'locmem':
+        return LocMemCache(f'benchmark-{os.getpid()}', params)
+    if name == 'filebased':
+        return FileBasedCache(os.path.join(directory, 'files'), params)
+    return SQLiteCache(os.path.join(directory, 'cache.sqlite3'), params)
+
+
+def timed(samples, operation, *args):
+    started = time.perf_counter()
+    operation(*args)
+    samples.append((time.perf_counter() - started) * 10 ** 6)
+
+
+def measure_operations(cache, value, repeat):
+    """Задержки отдельных операций в микросекундах."""
+    samples = {name: [] for name in
+               ('set', 'get_hit', 'get_miss', 'get_many', 'incr')}
+    keys = [f'key:{number}' for number in range(repeat)]
+    for key in keys:
+        timed(samples['set'], cache.set, key, value)
+    for key in keys:
+        timed(samples['get_hit'], cache.get, key)
+        timed(samples['get_miss'], cache.get, f'missing:{key}')
+    for start in range(0, repeat, MANY_KEYS):
+        timed(samples['get_many'], cache.get_many,
+              keys[start:start + MANY_KEYS])
+    cache.set('counter', 0)
+    for _ in range(repeat):
+        timed(samples['incr'], cache.incr, 'counter')
+    return {name: benchmark.summarize(values)
+            for name, values in samples.items()}
+
+
+def shared_worker(name, directory, value, keyspace, operations, seed):
+    """Чтение с досозданием при промахе, как у кэша страниц."""
+    cache = make_cache(name, directory)
+    rng = random.Random(seed)
+    hits = 0
+    started = time.perf_counter()
+    for _ in range(operations):
+        key = f'page:{rng.randrange(keyspace)}'
+        if cache.get(key) is None:
+            cache.set(key, value)
+        else:
+            hits += 1
+    return hits, time.perf_counter() - started
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает LocMemCache, FileBasedCache и общий SQLite-кэш: '
+            'задержки операций и долю попаданий при нескольких процессах')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--backends', nargs='+', choices=BACKENDS, default=list(BACKENDS))
+        parser.add_argument(
+            '--repeat', type=int, default=1000,
+            help='Число операций каждого вида в замере задержек',
+        )
+        parser.add_argument(
+            '--processes', type=int, default=4,
+            help='Число процессов в замере общего кэша',
+        )
+        parser.add_argument(
+            '--operations', type=int, default=2000,
+            help='Число чтений на процесс в замере общего кэша',
+        )
+        parser.add_argument(
+            '--keyspace', type=int, default=200,
+            help='Число разных страниц в замере общего кэша',
+        )
+        parser.add_argument(
+            '--output', help='Файл результатов; по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < MANY_KEYS or options['processes'] < 1:
+            raise CommandError(
+                f'--repeat должен быть не меньше {MANY_KEYS}, '
+                '--processes - не меньше 1')
+        results = {
+            'environment': benchmark.environment(),
+            'settings': {key: options[key] for key in (
+                'repeat', 'processes', 'operations', 'keyspace')},
+            'operations': [],
+            'shared': [],
+        }
+        for name in options['backends']:
+            for size_name, size in VALUE_SIZES.items():
+                directory = tempfile.mkdtemp(prefix='cache-benchmark-')
+                try:
+                    timings = measure_operations(
+                        make_cache(name, directory), 'x' * size,
+                        options['repeat'])
+                finally:
+                    shutil.rmtree(directory)
+                results['operations'].append(
+                    {'backend': name, 'value': size_name, 'us': timings})
+                self.stderr.write(
+                    f'{name:>9} {size_name:<6} ' + '  '.join(
+                        f'{op} {summary["p50"]:.1f}'
+                        for op, summary in timings.items()) + ' мкс')
+            shared = self.measure_shared(name, options)
+            results['shared'].append(shared)
+            self.stderr.write(
+                f'{name:>9} {options["processes"]} процесса: '
+                f'{shared["ops_per_second"]:.0f} оп/с, '
+                f'попаданий {shared["hit_rate"]:.1%}')
+        benchmark.write_results(results, options['output'], self.stdout)
+
+    def measure_shared(self, name, options):
+        directory = tempfile.mkdtemp(prefix='cache-benchmark-')
+        value = 'x' * VALUE_SIZES['page']
+        context = multiprocessing.get_context('fork')
+        try:
+            with context.Pool(options['processes']) as pool:
+                runs = pool.starmap(shared_worker, [
+                    (name, directory, value, options['keyspace'],
+                     options['operations'], seed)
+                    for seed in range(options['processes'])
+                ])
+        finally:
+            shutil.rmtree(directory)
+        hits = sum(hits for hits, _ in runs)
+        total = options['operations'] * options['processes']
+        return {
+            'backend': name,
+            'processes': options['processes'],
+            'hit_rate': round(hits / total, 4),
+            'ops_per_second': round(total / max(
+                elapsed for _, elapsed in runs), 1),
+        }
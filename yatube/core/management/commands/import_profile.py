@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark, import_profile
+
+
+class Command(BaseCommand):
+    help = ('Время импорта модулей при старте воркера WSGI и manage.py: '
+            'полное и собственное по модулям и пакетам')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--targets', nargs='+', choices=list(import_profile.TARGETS),
+            default=['wsgi', 'manage'])
+        parser.add_argument(
+            '--repeat', type=int, default=5,
+            help='Число запусков; в отчёте медиана',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Число строк в списках модулей и пакетов',
+        )
+        parser.add_argument(
+            '--no-warmup', action='store_true',
+            help='Для wsgi: без прогрева core.warmup (YATUBE_WARMUP=0)',
+        )
+        parser.add_argument(
+            '--output', help='Файл результатов в JSON')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше нуля')
+        env = {'YATUBE_WARMUP': '0'} if options['no_warmup'] else {}
+        results = {
+            'environment': benchmark.environment(),
+            'settings': {'repeat': options['repeat'],
+                         'warmup': not options['no_warmup']},
+            'targets': {},
+        }
+        for target in options['targets']:
+            try:
+                modules = import_profile.profile(
+                    import_profile.TARGETS[target], options['repeat'], env)
+            except RuntimeError as error:
+                raise CommandError(f'{target}: {error}')
+            summary = import_profile.summarize(modules, options['limit'])
+            results['targets'][target] = summary
+            self.write_summary(target, summary)
+        if options['output']:
+            benchmark.write_results(results, options['output'])
+
+    def write_summary(self, target, summary):
+        self.stdout.write(
+            f'{target}: импорт {summary["total_ms"]:.1f} ms')
+        self.stdout.write('  полное   собств.  модуль')
+        for row in summary['modules']:
+            mark = '*' if row['project'] else ' '
+            self.stdout.write(
+                f'{row["cumulative_ms"]:>8.1f} {row["self_ms"]:>8.1f} '
+                f'{mark}{row["module"]}')
+        self.stdout.write('  модули проекта:')
+        for row in summary['project']:
+            self.stdout.write(
+                f'{row["cumulative_ms"]:>8.1f} {row["self_ms"]:>8.1f}  '
+                f'{row["module"]}')
+        self.stdout.write('  пакеты по собственному времени:')
+        for row in summary['packages']:
+            self.stdout.write(
+                f'{row["self_ms"]:>17.1f}  {row["package"]}')
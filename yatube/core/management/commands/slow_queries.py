@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import slow_queries
+
+SORT_KEYS = {
+    'total': lambda group: group['total_ms'],
+    'count': lambda group: group['count'],
+    'max': lambda group: group['max_ms'],
+}
+
+
+class Command(BaseCommand):
+    help = ('Сводка журнала медленных запросов: худшие запросы по '
+            'fingerprint с view и строками шаблонов, откуда они пришли')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', help='Файл журнала; по умолчанию SLOW_QUERY_LOG')
+        parser.add_argument(
+            '--sort', choices=list(SORT_KEYS), default='total',
+            help='Порядок: суммарное время, число или худшее время',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=10,
+            help='Число запросов в сводке',
+        )
+        parser.add_argument(
+            '--view', help='Только запросы этой view, например posts:index')
+
+    def handle(self, *args, **options):
+        path = options['log'] or slow_queries.log_path()
+        if not path:
+            raise CommandError(
+                'Журнал не задан: укажите SLOW_QUERY_LOG или --log')
+        records = slow_queries.read_records(path)
+        if options['view']:
+            records = (record for record in records
+                       if record.get('view') == options['view'])
+        groups = slow_queries.summarize(records)
+        if not groups:
+            self.stdout.write('Медленных запросов нет')
+            return
+        groups.sort(key=SORT_KEYS[options['sort']], reverse=True)
+        for number, group in enumerate(groups[:options['limit']], 1):
+            self.stdout.write(
+                f'{number}. {group["count"]} раз, всего '
+                f'{group["total_ms"]:.1f} ms, среднее '
+                f'{group["total_ms"] / group["count"]:.1f} ms, худшее '
+                f'{group["max_ms"]:.1f} ms')
+            self.stdout.write(f'   {group["fingerprint"][:500]}')
+            for title, counts in (('view', group['views']),
+                                  ('откуда', group['sources'])):
+                top = sorted(counts.items(), key=lambda item: -item[1])[:3]
+                self.stdout.write(f'   {title}: ' + ', '.join(
+                    f'{name} ({count})' for name, count in top))
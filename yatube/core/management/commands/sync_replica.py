@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.db_routing import replica_alias, sync_replica
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в реплику для чтения'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', default=None,
+            help='Псевдоним реплики; по умолчанию DATABASE_REPLICA',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Повторять копирование каждые N секунд; 0 - один раз',
+        )
+
+    def handle(self, *args, **options):
+        alias = options['database'] or replica_alias()
+        if alias is None:
+            raise CommandError(
+                'Реплика не настроена: задайте YATUBE_REPLICA_PATH '
+                'или --database')
+        while True:
+            started = time.perf_counter()
+            try:
+                sync_replica(alias)
+            except ValueError as error:
+                raise CommandError(error)
+            elapsed = (time.perf_counter() - started) * 1000
+            self.stdout.write(f'Реплика {alias} обновлена за {elapsed:.1f} ms')
+            if not options['interval']:
+                return
+            connections.close_all()
+            time.sleep(options['interval'])
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from core.warmup import warmup
+
+
+class Command(BaseCommand):
+    help = ('Компилирует шаблоны проекта, вызывает reverse() для всех '
+            'маршрутов и загружает движок миниатюр, как при старте воркера')
+
+    def handle(self, *args, **options):
+        report = warmup()
+        templates, urls = report['templates'], report['urls']
+        self.stdout.write(
+            f'Шаблонов: {templates["compiled"]}, маршрутов: '
+            f'{urls["reversed"]}, sorl: {", ".join(report["thumbnail"])} '
+            f'за {report["seconds"] * 1000:.0f} ms')
+        if urls['skipped']:
+            self.stdout.write(
+                'Без reverse() (нет подходящих аргументов): '
+                + ', '.join(urls['skipped']))
+        for name, error in templates['errors'].items():
+            self.stderr.write(f'Шаблон {name}: {error}')
@@ -0,0 +1,323 @@
+"""Метрики страниц: задержка, запросы к базе, шаблоны и кэш.
+
+MetricsMiddleware собирает по каждому запросу время ответа, число и
+время запросов к базе, время рендера шаблонов и попадания в кэш
+страниц, отдаёт их в заголовке Server-Timing и копит в REGISTRY с
+меткой view - именем маршрута вроде posts:index. Представление
+metrics отдаёт накопленное в текстовом формате Prometheus.
+
+Счётчики у каждого процесса свои. Если задан METRICS_DIR, процесс не
+чаще раза в FLUSH_INTERVAL секунд пишет свой снимок в файл <pid>.json
+этого каталога, а /metrics складывает снимки всех процессов - так
+ответ не зависит от того, какой воркер его отдал. Снимки процессов,
+которых уже нет (перезапуск сервера, упавший воркер), collect удаляет,
+чтобы их счётчики не складывались вечно.
+
+Накладные расходы - пара вызовов perf_counter на запрос к базе и
+на рендер шаблона и одна блокировка на запрос, поэтому метрики
+включены всегда.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+FLUSH_INTERVAL = 5.0
+UNRESOLVED = '<unresolved>'
+
+HELP = {
+    'yatube_requests_total': ('counter', 'Число запросов'),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время ответа, секунды'),
+    'yatube_db_queries_total': ('counter', 'Число запросов к базе'),
+    'yatube_db_query_seconds_total': (
+        'counter', 'Время запросов к базе, секунды'),
+    'yatube_template_render_seconds_total': (
+        'counter', 'Время рендера шаблонов, секунды'),
+    'yatube_page_cache_total': (
+        'counter', 'Обращения к кэшу страниц по результату'),
+}
+
+_state = threading.local()
+
+
+class RequestMetrics:
+    """Счётчики одного запроса; execute_wrapper для соединений."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.template_depth = 0
+        self.cache = {'hit': 0, 'miss': 0}
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - started
+            self.queries += 1
+
+
+def current():
+    """Счётчики текущего запроса или None вне MetricsMiddleware."""
+    return getattr(_state, 'metrics', None)
+
+
+@contextmanager
+def template_timer():
+    """Время рендера шаблона; вложенный рендер не считается дважды."""
+    metrics = current()
+    if metrics is None:
+        yield
+        return
+    metrics.template_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.template_depth -= 1
+        if not metrics.template_depth:
+            metrics.template_seconds += time.perf_counter() - started
+
+
+def record_cache(hit):
+    """Отмечает попадание или промах кэша страниц."""
+    metrics = current()
+    if metrics is not None:
+        metrics.cache['hit' if hit else 'miss'] += 1
+
+
+class Registry:
+    """Счётчики и гистограммы процесса с метками."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.histograms = {}
+        self._flushed = 0.0
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += value
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {
+                    'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0}
+            index = bisect_left(BUCKETS, value)
+            if index < len(BUCKETS):
+                histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def record(self, view, method, status, duration, metrics):
+        labels = {'view': view}
+        self.inc('yatube_requests_total',
+                 {**labels, 'method': method, 'status': str(status)})
+        self.observe('yatube_request_duration_seconds', labels, duration)
+        self.inc('yatube_db_queries_total', labels, metrics.queries)
+        self.inc('yatube_db_query_seconds_total', labels,
+                 metrics.db_seconds)
+        self.inc('yatube_template_render_seconds_total', labels,
+                 metrics.template_seconds)
+        for result, count in metrics.cache.items():
+            if count:
+                self.inc('yatube_page_cache_total',
+                         {**labels, 'result': result}, count)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'counters': [[name, dict(labels), value] for (
+                    name, labels), value in self.counters.items()],
+                'histograms': [[name, dict(labels), dict(
+                    histogram, buckets=list(histogram['buckets']))]
+                    for (name, labels), histogram in
+                    self.histograms.items()],
+            }
+
+    def flush(self, directory, force=False):
+        """Пишет снимок процесса в directory/<pid>.json."""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._flushed < FLUSH_INTERVAL:
+                return
+            self._flushed = now
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        # Свой временный файл у каждого потока: /metrics пишет снимок
+        # с force, не дожидаясь потока, который пишет его по интервалу.
+        temporary = f'{path}.{threading.get_ident()}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump(self.snapshot(), file)
+        os.replace(temporary, path)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+
+REGISTRY = Registry()
+
+
+def metrics_dir():
+    return getattr(settings, 'METRICS_DIR', None)
+
+
+def process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # Процесс есть, но принадлежит другому пользователю.
+        return True
+    return True
+
+
+def collect():
+    """Снимки живых процессов из METRICS_DIR или снимок этого процесса.
+
+    Снимки завершившихся процессов удаляются.
+    """
+    directory = metrics_dir()
+    if not directory:
+        return [REGISTRY.snapshot()]
+    REGISTRY.flush(directory, force=True)
+    snapshots = []
+    for name in sorted(os.listdir(directory)):
+        pid, extension = os.path.splitext(name)
+        if extension != '.json' or not pid.isdigit():
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if not process_alive(int(pid)):
+                os.remove(path)
+                continue
+            with open(path, encoding='utf-8') as file:
+                snapshots.append(json.load(file))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+
+def merge(snapshots):
+    """Складывает снимки процессов: (имя, метки) -> значение."""
+    counters, histograms = defaultdict(float), {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot['counters']:
+            counters[name, tuple(sorted(labels.items()))] += value
+        for name, labels, histogram in snapshot['histograms']:
+            key = (name, tuple(sorted(labels.items())))
+            total = histograms.setdefault(key, {
+                'buckets': [0] * len(BUCKETS), 'sum': 0.0, 'count': 0})
+            for index, count in enumerate(histogram['buckets']):
+                total['buckets'][index] += count
+            total['sum'] += histogram['sum']
+            total['count'] += histogram['count']
+    return counters, histograms
+
+
+def _labels(labels, **extra):
+    items = [*labels, *extra.items()]
+    if not items:
+        return ''
+    escaped = (
+        str(value).replace('\\', r'\\').replace('"', r'\"').replace(
+            '\n', r'\n') for _, value in items)
+    return '{' + ','.join(
+        f'{name}="{value}"' for (name, _), value in zip(items, escaped)
+    ) + '}'
+
+
+def render(snapshots):
+    """Текстовый формат Prometheus 0.0.4."""
+    counters, histograms = merge(snapshots)
+    lines = []
+    for metric, (kind, help_text) in HELP.items():
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} {kind}')
+        if kind == 'histogram':
+            for (name, labels), histogram in sorted(histograms.items()):
+                if name != metric:
+                    continue
+                cumulative = 0
+                for bound, count in zip(BUCKETS, histogram['buckets']):
+                    cumulative += count
+                    lines.append(f'{name}_bucket'
+                                 f'{_labels(labels, le=bound)} {cumulative}')
+                lines.append(f'{name}_bucket{_labels(labels, le="+Inf")} '
+                             f'{histogram["count"]}')
+                lines.append(f'{name}_sum{_labels(labels)} '
+                             f'{histogram["sum"]:.6f}')
+                lines.append(f'{name}_count{_labels(labels)} '
+                             f'{histogram["count"]}')
+        else:
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    value = int(value) if value == int(value) else value
+                    lines.append(f'{name}{_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def view_name(request):
+    """Имя маршрута с пространством имён приложения: posts:index."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None or not match.url_name:
+        return UNRESOLVED
+    return ':'.join([*match.app_names, match.url_name])
+
+
+def server_timing(metrics, duration):
+    """Значение заголовка Server-Timing."""
+    parts = [
+        f'db;dur={metrics.db_seconds * 1000:.1f};'
+        f'desc="{metrics.queries} queries"',
+        f'tpl;dur={metrics.template_seconds * 1000:.1f}',
+    ]
+    if metrics.cache['hit'] or metrics.cache['miss']:
+        result = 'hit' if metrics.cache['hit'] else 'miss'
+        parts.append(f'cache;desc="{result}"')
+    parts.append(f'total;dur={duration * 1000:.1f}')
+    return ', '.join(parts)
+
+
+class MetricsMiddleware:
+    """Стоит первым в MIDDLEWARE, чтобы время ответа включало остальные
+    middleware."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = _state.metrics = RequestMetrics()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics))
+                response = self.get_response(request)
+        finally:
+            _state.metrics = None
+        duration = time.perf_counter() - started
+        response['Server-Timing'] = server_timing(metrics, duration)
+        REGISTRY.record(view_name(request), request.method,
+                        response.status_code, duration, metrics)
+        directory = metrics_dir()
+        if directory:
+            REGISTRY.flush(directory)
+        return response
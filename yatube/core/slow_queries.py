@@ -0,0 +1,222 @@
+"""Журнал медленных запросов к базе с указанием, откуда они пришли.
+
+SlowQueryMiddleware ставит на все соединения execute_wrapper. Запрос
+дольше SLOW_QUERY_MS пишется строкой JSON в SLOW_QUERY_LOG: SQL с
+плейсхолдерами (значения параметров не пишутся), длительность, имя
+маршрута, шаблон и строка шаблона, на которой выполнялся тег или
+переменная, и ближайший кадр кода проекта. Так видно, что запрос
+сделал, например, {{ post.author }} в posts/includes/post_list.html,
+а не сама view.
+
+Файл ротируется по SLOW_QUERY_LOG_MAX_BYTES, хранится
+SLOW_QUERY_LOG_BACKUPS старых файлов. Без SLOW_QUERY_LOG middleware
+отключается целиком. Сводку по худшим запросам печатает команда
+slow_queries.
+"""
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Node
+from django.utils import timezone
+
+from .metrics import view_name
+
+DEFAULT_THRESHOLD_MS = 100
+DEFAULT_MAX_BYTES = 10 * 2 ** 20
+DEFAULT_BACKUPS = 5
+
+logger = logging.getLogger(__name__)
+_handler_lock = threading.Lock()
+
+RENDER_CODE = Node.render_annotated.__code__
+WRAPPER_ARGS = ('execute', 'sql', 'params', 'many', 'context')
+# Обвязка, которая сама запросов не делает
+SKIP_FRAMES = ('core/backends/', 'core/metrics.py', 'core/slow_queries.py')
+
+
+def log_path():
+    return getattr(settings, 'SLOW_QUERY_LOG', None)
+
+
+def threshold_ms():
+    return getattr(settings, 'SLOW_QUERY_MS', DEFAULT_THRESHOLD_MS)
+
+
+def get_logger():
+    """Логгер с RotatingFileHandler на текущий SLOW_QUERY_LOG."""
+    path = os.path.abspath(log_path())
+    handler = next(iter(logger.handlers), None)
+    if handler is not None and handler.baseFilename == path:
+        return logger
+    with _handler_lock:
+        for handler in logger.handlers[:]:
+            logger.removeHandler(handler)
+            handler.close()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(
+            path, encoding='utf-8',
+            maxBytes=getattr(settings, 'SLOW_QUERY_LOG_MAX_BYTES',
+                             DEFAULT_MAX_BYTES),
+            backupCount=getattr(settings, 'SLOW_QUERY_LOG_BACKUPS',
+                                DEFAULT_BACKUPS),
+        )
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def _relative(filename):
+    base = str(settings.BASE_DIR)
+    if filename.startswith(base + os.sep):
+        return os.path.relpath(filename, base)
+    return None
+
+
+def _is_execute_wrapper(code):
+    names = code.co_varnames[:code.co_argcount]
+    return names[-len(WRAPPER_ARGS):] == WRAPPER_ARGS
+
+
+def find_origin(frame):
+    """Шаблон со строкой и кадр кода проекта, выполнившие запрос.
+
+    Шаблон - самый вложенный узел, который рендерился в момент
+    запроса (Node.render_annotated). Кадр - ближайший вызов из файлов
+    проекта, кроме execute_wrapper вроде QueryCounter и обвязки из
+    SKIP_FRAMES.
+    """
+    template = line = python_frame = None
+    while frame is not None:
+        code = frame.f_code
+        if template is None and code is RENDER_CODE:
+            node = frame.f_locals.get('self')
+            origin = getattr(node, 'origin', None)
+            token = getattr(node, 'token', None)
+            if origin is not None:
+                template = origin.template_name or origin.name
+                line = getattr(token, 'lineno', None)
+        if python_frame is None and not _is_execute_wrapper(code):
+            relative = _relative(code.co_filename)
+            if relative is not None and not relative.startswith(
+                    SKIP_FRAMES):
+                python_frame = (
+                    f'{relative}:{frame.f_lineno} in {code.co_name}')
+        if template is not None and python_frame is not None:
+            break
+        frame = frame.f_back
+    return template, line, python_frame
+
+
+class SlowQueryRecorder:
+    """execute_wrapper одного запроса к сайту."""
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            if duration >= self.threshold:
+                self.record(sql, duration, many, context)
+
+    def record(self, sql, duration, many, context):
+        template, line, python_frame = find_origin(sys._getframe(2))
+        get_logger().info(json.dumps({
+            'time': timezone.now().isoformat(),
+            'duration_ms': round(duration, 3),
+            'sql': sql,
+            'many': many,
+            'database': context['connection'].alias,
+            'view': view_name(self.request),
+            'method': self.request.method,
+            'path': self.request.path,
+            'template': template,
+            'line': line,
+            'frame': python_frame,
+        }, ensure_ascii=False))
+
+
+class SlowQueryMiddleware:
+    def __init__(self, get_response):
+        if not log_path():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = SlowQueryRecorder(request, threshold_ms())
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            return self.get_response(request)
+
+
+FINGERPRINT_RULES = (
+    (re.compile(r"'(?:[^']|'')*'"), '?'),
+    (re.compile(r'\b\d+(?:\.\d+)?\b'), '?'),
+    (re.compile(r'%s'), '?'),
+    (re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)'), '(...)'),
+    (re.compile(r'\s+'), ' '),
+)
+
+
+def fingerprint(sql):
+    """SQL без значений: запросы, отличающиеся только ими, совпадают."""
+    for pattern, replacement in FINGERPRINT_RULES:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+def read_records(path):
+    """Записи журнала path и его старых файлов path.1, path.2..."""
+    paths = [path]
+    number = 1
+    while os.path.exists(f'{path}.{number}'):
+        paths.append(f'{path}.{number}')
+        number += 1
+    for name in reversed(paths):
+        if not os.path.exists(name):
+            continue
+        with open(name, encoding='utf-8') as file:
+            for text in file:
+                try:
+                    yield json.loads(text)
+                except ValueError:
+                    continue
+
+
+def summarize(records):
+    """Группы записей по fingerprint со статистикой и источниками."""
+    groups = {}
+    for record in records:
+        key = fingerprint(record['sql'])
+        group = groups.setdefault(key, {
+            'fingerprint': key, 'count': 0, 'total_ms': 0.0,
+            'max_ms': 0.0, 'views': {}, 'sources': {},
+        })
+        group['count'] += 1
+        group['total_ms'] += record['duration_ms']
+        group['max_ms'] = max(group['max_ms'], record['duration_ms'])
+        view = record.get('view') or '-'
+        group['views'][view] = group['views'].get(view, 0) + 1
+        if record.get('template'):
+            source = f'{record["template"]}:{record.get("line")}'
+        else:
+            source = record.get('frame') or '-'
+        group['sources'][source] = group['sources'].get(source, 0) + 1
+    return list(groups.values())
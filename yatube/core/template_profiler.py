@@ -0,0 +1,185 @@
+"""Профиль рендера шаблонов: где тратится время внутри страницы.
+
+Включается заданием TEMPLATE_PROFILE_DIR. Тогда TemplateProfilerMiddleware
+при загрузке оборачивает Template._render и Node.render_annotated и для
+каждого запроса считает по шаблонам (включая include и extends) и по
+узлам-тегам ({% thumbnail %}, {% include %}, переменные с фильтрами
+вроде |addclass) число вызовов, полное время и собственное время без
+вложенных шаблонов и тегов. Простые переменные и текст отдельно не
+меряются: их время входит в собственное время шаблона. Оборачивается
+_render, а не render: {% extends %} рендерит родителя через
+compiled_parent._render, и с render базовый шаблон в профиль не попал
+бы, а его время досталось бы узлу {% extends %} дочернего.
+
+В TEMPLATE_PROFILE_DIR пишутся:
+
+- requests.jsonl - строка на запрос со временем по шаблонам и узлам;
+- templates.folded - стеки в формате collapsed stacks (время в
+  микросекундах), корень стека - имя маршрута. Файл понимают
+  flamegraph.pl и speedscope:
+
+    flamegraph.pl templates.folded > templates.svg
+
+Без настройки обёртки не ставятся и профиль ничего не стоит.
+"""
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.template.base import Node, Template, TextNode, VariableNode
+from django.utils import timezone
+
+from .metrics import view_name
+
+_state = threading.local()
+_install_lock = threading.Lock()
+_file_lock = threading.Lock()
+_originals = {}
+
+
+def profile_dir():
+    return getattr(settings, 'TEMPLATE_PROFILE_DIR', None)
+
+
+def current():
+    return getattr(_state, 'profile', None)
+
+
+class Profile:
+    """Стек рендера одного запроса и накопленное время."""
+
+    def __init__(self):
+        self.stack = []
+        self.folded = defaultdict(int)
+        self.stats = {'templates': {}, 'nodes': {}}
+
+    def enter(self, label):
+        self.stack.append([label, time.perf_counter_ns(), 0])
+
+    def leave(self, kind, key):
+        label, started, children = self.stack.pop()
+        elapsed = time.perf_counter_ns() - started
+        if self.stack:
+            self.stack[-1][2] += elapsed
+        path = ';'.join([*(frame[0] for frame in self.stack), label])
+        self.folded[path] += elapsed - children
+        stats = self.stats[kind].setdefault(key, [0, 0, 0])
+        stats[0] += 1
+        stats[1] += elapsed
+        stats[2] += elapsed - children
+
+    def as_record(self):
+        return {kind: {
+            key: {'calls': calls, 'cumulative_ms': round(total / 1e6, 3),
+                  'self_ms': round(own / 1e6, 3)}
+            for key, (calls, total, own) in sorted(
+                stats.items(), key=lambda item: -item[1][1])
+        } for kind, stats in self.stats.items()}
+
+    def folded_lines(self, root):
+        return [f'{root};{path} {nanoseconds // 1000}'
+                for path, nanoseconds in self.folded.items()
+                if nanoseconds >= 1000]
+
+
+def _clean(label):
+    # ';' разделяет кадры в collapsed stacks.
+    return label.replace(';', ',')
+
+
+def node_label(node):
+    """Подпись узла или None, если узел отдельно не меряется."""
+    if isinstance(node, TextNode):
+        return None
+    if isinstance(node, VariableNode):
+        filters = [func.__name__ for func, _ in node.filter_expression.filters]
+        return '|' + '|'.join(filters) if filters else None
+    token = getattr(node, 'token', None)
+    if token is None:
+        return None
+    bits = token.contents.split()
+    if not bits:
+        return None
+    name = ' '.join(bits[:2]) if bits[0] == 'block' else bits[0]
+    return f'{{% {name} %}}'
+
+
+def _template_render(self, context):
+    profile = current()
+    if profile is None:
+        return _originals['template'](self, context)
+    name = _clean(self.origin.template_name or self.name or '<string>')
+    profile.enter(name)
+    try:
+        return _originals['template'](self, context)
+    finally:
+        profile.leave('templates', name)
+
+
+def _node_render(self, context):
+    profile = current()
+    label = None if profile is None else node_label(self)
+    if label is None:
+        return _originals['node'](self, context)
+    label = _clean(label)
+    origin = getattr(self, 'origin', None)
+    template = origin.template_name if origin is not None else None
+    key = f'{template}:{self.token.lineno} {label}'
+    profile.enter(label)
+    try:
+        return _originals['node'](self, context)
+    finally:
+        profile.leave('nodes', key)
+
+
+def install():
+    """Оборачивает рендер шаблонов и узлов; повторный вызов ничего не
+    делает."""
+    with _install_lock:
+        if _originals:
+            return
+        _originals['template'] = Template._render
+        _originals['node'] = Node.render_annotated
+        Template._render = _template_render
+        Node.render_annotated = _node_render
+
+
+def write(directory, request, profile):
+    os.makedirs(directory, exist_ok=True)
+    record = {
+        'time': timezone.now().isoformat(),
+        'view': view_name(request),
+        'path': request.path,
+        **profile.as_record(),
+    }
+    with _file_lock:
+        with open(os.path.join(directory, 'requests.jsonl'), 'a',
+                  encoding='utf-8') as file:
+            file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        with open(os.path.join(directory, 'templates.folded'), 'a',
+                  encoding='utf-8') as file:
+            file.writelines(
+                line + '\n' for line in profile.folded_lines(
+                    _clean(record['view'])))
+
+
+class TemplateProfilerMiddleware:
+    def __init__(self, get_response):
+        if not profile_dir():
+            raise MiddlewareNotUsed
+        install()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = _state.profile = Profile()
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.profile = None
+        if profile.stats['templates']:
+            write(profile_dir(), request, profile)
+        return response
@@ -6,3 +6,16 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.simple_tag(takes_context=True)
+def url_replace(context, **kwargs):
+    """Строка запроса текущей страницы с заменёнными параметрами."""
+    query = context['request'].GET.copy()
+    query.pop('page', None)
+    for key, value in kwargs.items():
+        if value:
+            query[key] = value
+        else:
+            query.pop(key, None)
+    return query.urlencode()
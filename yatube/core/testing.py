@@ -0,0 +1,52 @@
+from contextlib import ExitStack, contextmanager
+
+from django.db import connection, connections
+from django.urls import resolve
+
+
+@contextmanager
+def run_on_commit():
+    """Выполняет on_commit-колбэки, добавленные внутри блока.
+
+    TestCase не коммитит транзакцию, поэтому transaction.on_commit в
+    тестах не срабатывает, а captureOnCommitCallbacks в Django 2.2 нет.
+    """
+    start = len(connection.run_on_commit)
+    yield
+    callbacks = connection.run_on_commit[start:]
+    del connection.run_on_commit[start:]
+    for _, callback in callbacks:
+        callback()
+
+
+class QueryBudgetMixin:
+    """Проверки бюджета запросов для TestCase."""
+
+    def get_query_budget(self, url):
+        view = resolve(url).func
+        while not hasattr(view, 'query_budget'):
+            view = getattr(view, '__wrapped__', None)
+            if view is None:
+                self.fail(f'У view для {url} не задан query_budget')
+        return view.query_budget
+
+    def assertWithinQueryBudget(self, client, url, data=None):
+        budget = self.get_query_budget(url)
+        queries = []
+
+        def record(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        # Запросы ко всем базам, как в query_budget: чтения GET могут
+        # уйти на реплику.
+        with ExitStack() as stack:
+            for db in connections.all():
+                stack.enter_context(db.execute_wrapper(record))
+            response = client.get(url, data)
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{url}: {len(queries)} запросов при бюджете {budget}:\n'
+            + '\n'.join(queries)
+        )
+        return response
@@ -0,0 +1,41 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+
+from django.db import connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from ..backends.sqlite3.base import PRAGMAS, apply_pragmas
+
+
+class SQLiteBackendTest(TestCase):
+    def test_pragmas_on_new_connection(self):
+        """Новое соединение получает PRAGMA из SQLITE_PRAGMAS"""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA synchronous')
+            # 1 - NORMAL
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+
+class SQLiteTransactionModeTest(TransactionTestCase):
+    def test_atomic_begins_immediate(self):
+        """atomic() сразу берёт блокировку записи"""
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries[0]['sql'], 'BEGIN IMMEDIATE')
+
+
+class ApplyPragmasTest(SimpleTestCase):
+    def test_file_database_switches_to_wal(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        database = sqlite3.connect(os.path.join(directory, 'db.sqlite3'))
+        self.addCleanup(database.close)
+        apply_pragmas(database, PRAGMAS)
+        self.assertEqual(
+            database.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
@@ -0,0 +1,21 @@
+from django.test import SimpleTestCase
+
+from ..benchmark import percentile, summarize
+
+
+class BenchmarkTest(SimpleTestCase):
+    def test_percentile_nearest_rank(self):
+        """Перцентиль берётся по ближайшему рангу."""
+        samples = list(range(100, 0, -1))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertEqual(percentile([7], 90), 7)
+
+    def test_summarize(self):
+        """Сводка содержит min, перцентили, max и среднее."""
+        summary = summarize([1, 2, 3, 4])
+        self.assertEqual(
+            list(summary), ['min', 'p50', 'p90', 'p99', 'max', 'mean'])
+        self.assertEqual(summary['p50'], 2)
+        self.assertEqual(summary['mean'], 2.5)
+        self.assertEqual(summarize([]), {})
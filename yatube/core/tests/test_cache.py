@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.test import SimpleTestCase
+
+from ..cache import SQLiteCache
+
+
+class SQLiteCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def make_cache(self, **options):
+        return SQLiteCache(
+            os.path.join(self.directory, 'cache.sqlite3'),
+            {'OPTIONS': options})
+
+    def test_get_set_add_incr(self):
+        """Основные операции кэша"""
+        cache = self.make_cache()
+        cache.set('post', {'text': 'Пост'})
+        self.assertEqual(cache.get('post'), {'text': 'Пост'})
+        self.assertEqual(cache.get('missing', 'нет'), 'нет')
+        self.assertFalse(cache.add('post', 'другой'))
+        self.assertTrue(cache.add('counter', 1))
+        self.assertEqual(cache.incr('counter', 2), 3)
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+        cache.set('text', 'Пост')
+        with self.assertRaises(ValueError):
+            cache.incr('text')
+        cache.delete('post')
+        self.assertEqual(cache.get_many(['post', 'counter']), {'counter': 3})
+
+    def test_shared_between_instances(self):
+        """Записи видны другому экземпляру с тем же файлом"""
+        self.make_cache().set('page', 'Главная')
+        self.assertEqual(self.make_cache().get('page'), 'Главная')
+
+    def test_expired_entries(self):
+        """Просроченные записи не возвращаются"""
+        cache = self.make_cache()
+        cache.set('page', 'Главная', 0.01)
+        time.sleep(0.02)
+        self.assertIsNone(cache.get('page'))
+        self.assertFalse(cache.has_key('page'))
+
+    def test_size_cap_evicts_least_recently_used(self):
+        """При превышении размера вытесняются давно читанные записи"""
+        cache = self.make_cache(MAX_SIZE=5000, CULL_FREQUENCY=10)
+        cache.set('old', 'x' * 1000)
+        cache.set('hot', 'x' * 1000)
+        connection = cache._connection()
+        connection.execute(
+            "UPDATE cache_entries SET accessed = accessed - 100 "
+            "WHERE key = ':1:old'")
+        cache.set('new', 'x' * 3000)
+        self.assertIsNone(cache.get('old'))
+        self.assertIsNotNone(cache.get('hot'))
+        self.assertIsNotNone(cache.get('new'))
@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core.db_routing import PIN_COOKIE, ReplicaMiddleware, sync_replica
+from core.decorators import QueryBudgetExceeded, query_budget
+from posts import follow_graph
+from posts.models import Follow, Post, UserStats
+
+User = get_user_model()
+
+
+@override_settings(DATABASE_REPLICA='replica')
+class ReplicaRoutingTests(TransactionTestCase):
+    # backup API ждёт, пока на реплике открыта транзакция, поэтому
+    # TransactionTestCase, а не TestCase.
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Старый пост')
+        sync_replica()
+        cache.clear()
+
+    def test_reads_from_replica_until_write(self):
+        """GET читает реплику, после записи - основную базу"""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        Post.objects.filter(pk=self.post.pk).update(text='Новый пост')
+        response = self.client.get(url)
+        self.assertEqual(response.context['post'].text, 'Старый пост')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse('posts:add_comment', args=[self.post.pk]),
+            {'text': 'Комментарий'})
+        self.assertIn(PIN_COOKIE, self.client.cookies)
+        response = self.client.get(url)
+        self.assertEqual(response.context['post'].text, 'Новый пост')
+
+    def test_query_budget_counts_replica_queries(self):
+        """query_budget считает запросы и к реплике"""
+        @query_budget(1)
+        def view(request):
+            Post.objects.using('replica').count()
+            Post.objects.count()
+            return HttpResponse()
+
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                view(RequestFactory().get('/'))
+
+    def test_sync_replica_copies_changes(self):
+        Post.objects.create(author=self.user, text='Ещё пост')
+        self.assertEqual(Post.objects.using('replica').count(), 1)
+        sync_replica()
+        self.assertEqual(Post.objects.using('replica').count(), 2)
+
+    def test_write_during_get_does_not_pin(self):
+        """Попутная запись GET-запроса не закрепляет за default"""
+        def write(request):
+            UserStats.objects.get_or_create(user=self.user)
+            return HttpResponse()
+
+        middleware = ReplicaMiddleware(write)
+        factory = RequestFactory()
+        self.assertNotIn(PIN_COOKIE, middleware(factory.get('/')).cookies)
+        self.assertIn(PIN_COOKIE, middleware(factory.post('/')).cookies)
+
+    def test_cached_page_built_from_primary(self):
+        """Страница под versioned_cache_page не кэширует старую реплику"""
+        Post.objects.create(author=self.user, text='Пост после копии')
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост после копии')
+
+    def test_following_ids_built_from_primary(self):
+        """Массив подписок строится по default в GET-запросе"""
+        author = User.objects.create_user(username='author')
+        Follow.objects.create(user=self.user, author=author)
+
+        def read(request):
+            return HttpResponse(str(list(
+                follow_graph.following_ids(self.user.pk))))
+
+        response = ReplicaMiddleware(read)(RequestFactory().get('/'))
+        self.assertEqual(response.content.decode(), f'[{author.pk}]')
@@ -0,0 +1,39 @@
+from django.test import SimpleTestCase
+
+from ..import_profile import TARGETS, parse, run, summarize
+
+STDERR = """\
+import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      1500 |       1500 |     posts.paginators
+import time:      2500 |       4000 |   posts.views
+import time:       300 |       4420 | yatube.urls
+"""
+
+
+class ImportProfileTest(SimpleTestCase):
+    def test_parse_skips_header(self):
+        self.assertEqual(parse(STDERR), [
+            ('_io', 120, 120),
+            ('posts.paginators', 1500, 1500),
+            ('posts.views', 2500, 4000),
+            ('yatube.urls', 300, 4420),
+        ])
+
+    def test_summarize_orders_by_cumulative(self):
+        modules = {name: (own, cumulative)
+                   for name, own, cumulative in parse(STDERR)}
+        summary = summarize(modules, limit=2)
+        self.assertEqual(summary['total_ms'], 4.4)
+        self.assertEqual(
+            [row['module'] for row in summary['modules']],
+            ['yatube.urls', 'posts.views'])
+        self.assertTrue(summary['modules'][0]['project'])
+        self.assertEqual(summary['packages'][0],
+                         {'package': 'posts', 'self_ms': 4.0})
+
+    def test_setup_does_not_import_heavy_modules(self):
+        # PIL импортируется лениво, там, где нужен; asyncio не нужен вовсе.
+        modules = run(TARGETS['manage'])
+        self.assertIn('posts.signals', modules)
+        self.assertEqual({'PIL.Image', 'asyncio'} & set(modules), set())
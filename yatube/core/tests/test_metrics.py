@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from .. import metrics
+
+User = get_user_model()
+
+
+class MetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.REGISTRY.reset()
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+
+    def test_server_timing_header(self):
+        """Ответ несёт Server-Timing с базой, шаблонами и кэшем"""
+        response = self.client.get(reverse('posts:index'))
+        timing = response['Server-Timing']
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="\d+ queries"')
+        self.assertIn('tpl;dur=', timing)
+        self.assertIn('cache;desc="miss"', timing)
+        response = self.client.get(reverse('posts:index'))
+        self.assertIn('cache;desc="hit"', response['Server-Timing'])
+
+    def test_prometheus_endpoint(self):
+        """/metrics отдаёт счётчики по имени маршрута"""
+        self.client.get(reverse('posts:profile', args=[self.user.username]))
+        with override_settings(METRICS_TOKEN='secret'):
+            response = self.client.get(
+                '/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn(
+            'yatube_requests_total{method="GET",status="200",'
+            'view="posts:profile"} 1', text)
+        self.assertIn('yatube_request_duration_seconds_bucket{'
+                      'view="posts:profile",le="+Inf"} 1', text)
+        self.assertRegex(
+            text, r'yatube_db_queries_total\{view="posts:profile"\} [1-9]')
+
+    def test_prometheus_endpoint_is_private(self):
+        """Без токена в настройках или в запросе /metrics не найден"""
+        self.assertEqual(self.client.get(
+            '/metrics', HTTP_AUTHORIZATION='Bearer ').status_code, 404)
+        with override_settings(METRICS_TOKEN='secret'):
+            for header in ('', 'Bearer wrong', 'secret'):
+                response = self.client.get(
+                    '/metrics', HTTP_AUTHORIZATION=header)
+                self.assertEqual(response.status_code, 404)
+
+
+class MetricsMergeTest(SimpleTestCase):
+    def setUp(self):
+        metrics.REGISTRY.reset()
+
+    def test_parallel_flushes(self):
+        """Потоки пишут снимок через свои временные файлы"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        registry = metrics.Registry()
+        registry.inc('yatube_db_queries_total', {'view': 'posts:index'})
+        errors = []
+
+        def flush():
+            try:
+                for _ in range(20):
+                    registry.flush(directory, force=True)
+            except OSError as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=flush) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(os.listdir(directory), [f'{os.getpid()}.json'])
+        with open(os.path.join(directory, f'{os.getpid()}.json'),
+                  encoding='utf-8') as file:
+            self.assertEqual(json.load(file), registry.snapshot())
+
+    def test_snapshots_of_processes_are_summed(self):
+        """/metrics складывает снимки всех процессов из METRICS_DIR"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        registry = metrics.Registry()
+        registry.inc('yatube_db_queries_total', {'view': 'posts:index'}, 3)
+        registry.observe(
+            'yatube_request_duration_seconds', {'view': 'posts:index'}, 0.02)
+        # Снимки берутся только у живых процессов
+        for pid in (1, os.getppid()):
+            path = os.path.join(directory, f'{pid}.json')
+            with open(path, 'w', encoding='utf-8') as file:
+                json.dump(registry.snapshot(), file)
+        with override_settings(METRICS_DIR=directory):
+            text = metrics.render(metrics.collect())
+        self.assertIn(
+            'yatube_db_queries_total{view="posts:index"} 6', text)
+        self.assertIn('yatube_request_duration_seconds_bucket{'
+                      'view="posts:index",le="0.01"} 0', text)
+        self.assertIn('yatube_request_duration_seconds_bucket{'
+                      'view="posts:index",le="0.025"} 2', text)
+
+    def test_snapshots_of_dead_processes_are_removed(self):
+        """Снимок завершившегося процесса удаляется и не учитывается"""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        registry = metrics.Registry()
+        registry.inc('yatube_db_queries_total', {'view': 'posts:index'}, 3)
+        process = subprocess.Popen([sys.executable, '-c', ''])
+        process.wait()
+        with open(os.path.join(directory, f'{process.pid}.json'), 'w',
+                  encoding='utf-8') as file:
+            json.dump(registry.snapshot(), file)
+        with override_settings(METRICS_DIR=directory):
+            text = metrics.render(metrics.collect())
+        self.assertNotIn('yatube_db_queries_total{view="posts:index"}', text)
+        self.assertEqual(os.listdir(directory), [f'{os.getpid()}.json'])
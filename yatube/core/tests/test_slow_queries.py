@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+from ..slow_queries import fingerprint, read_records
+
+User = get_user_model()
+
+
+class SlowQueryLogTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'slow.jsonl')
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+
+    def get_records(self, url):
+        with override_settings(SLOW_QUERY_LOG=self.path, SLOW_QUERY_MS=0):
+            self.client.force_login(self.user)
+            self.client.get(url)
+        return list(read_records(self.path))
+
+    def test_records_view_template_and_frame(self):
+        """Запись указывает view, строку шаблона и кадр кода"""
+        records = self.get_records(reverse('posts:index'))
+        self.assertTrue(records)
+        self.assertEqual({record['view'] for record in records},
+                         {'posts:index'})
+        from_template = [record for record in records
+                         if record['template']]
+        self.assertTrue(from_template)
+        self.assertIsInstance(from_template[0]['line'], int)
+        self.assertTrue(any(record['frame'].startswith('posts/')
+                            for record in records))
+
+    def test_summary_command(self):
+        self.get_records(
+            reverse('posts:profile', args=[self.user.username]))
+        stdout = StringIO()
+        call_command('slow_queries', log=self.path, sort='count',
+                     stdout=stdout)
+        self.assertIn('view: posts:profile', stdout.getvalue())
+
+    def test_disabled_without_log(self):
+        self.client.get(reverse('posts:index'))
+        self.assertFalse(os.path.exists(self.path))
+
+
+class FingerprintTest(SimpleTestCase):
+    def test_values_are_replaced(self):
+        self.assertEqual(
+            fingerprint('SELECT * FROM t WHERE id IN (%s, %s) AND a = 5 '
+                        "AND b = 'x'"),
+            'SELECT * FROM t WHERE id IN (...) AND a = ? AND b = ?')
+        self.assertEqual(fingerprint('SELECT 1 IN (%s)'),
+                         fingerprint('SELECT 2  IN (%s, %s, %s)'))
@@ -0,0 +1,54 @@
+import json
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class TemplateProfilerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        user = User.objects.create_user(username='auth')
+        Post.objects.create(author=user, text='Пост')
+
+    def test_profile_per_request(self):
+        """Время по шаблонам и узлам и стеки для flame graph"""
+        with override_settings(TEMPLATE_PROFILE_DIR=self.directory):
+            self.client.get(reverse('posts:index'))
+        with open(os.path.join(self.directory, 'requests.jsonl'),
+                  encoding='utf-8') as file:
+            record = json.loads(file.readline())
+        self.assertEqual(record['view'], 'posts:index')
+        for name in ('posts/index.html', 'base.html',
+                     'posts/includes/post_list.html',
+                     'posts/includes/paginator.html'):
+            self.assertIn(name, record['templates'])
+        index = record['templates']['posts/index.html']
+        self.assertEqual(index['calls'], 1)
+        self.assertLessEqual(index['self_ms'], index['cumulative_ms'])
+        self.assertTrue(any(key.endswith('{% include %}')
+                            for key in record['nodes']))
+        with open(os.path.join(self.directory, 'templates.folded'),
+                  encoding='utf-8') as file:
+            lines = file.read().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            self.assertRegex(line, r'^posts:index;posts/index\.html'
+                                   r'(;[^;]+)* \d+$')
+        self.assertTrue(any(line.startswith(
+            'posts:index;posts/index.html;{% extends %};base.html')
+            for line in lines))
+
+    def test_disabled_by_default(self):
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(os.listdir(self.directory), [])
@@ -0,0 +1,43 @@
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+from ..warmup import compile_templates, reverse_urls
+
+CACHED_TEMPLATES = [{
+    **settings.TEMPLATES[0],
+    'OPTIONS': {
+        **settings.TEMPLATES[0]['OPTIONS'],
+        'loaders': [('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ])],
+    },
+}]
+
+
+class WarmupTest(SimpleTestCase):
+    @override_settings(TEMPLATES=CACHED_TEMPLATES)
+    def test_templates_stay_compiled(self):
+        """Шаблоны проекта компилируются в кэш загрузчика"""
+        compiled, errors = compile_templates()
+        self.assertEqual(errors, {})
+        self.assertIn('posts/index.html', compiled)
+        self.assertIn('posts/includes/post_list.html', compiled)
+        loader = engines.all()[0].engine.template_loaders[0]
+        self.assertIn('posts/index.html', {
+            key.split('-')[0] for key in loader.get_template_cache})
+
+    def test_every_url_name_is_reversed(self):
+        reversed_names, _ = reverse_urls()
+        for name in ('post:index', 'post:post_detail', 'post:profile',
+                     'about:author', 'metrics'):
+            self.assertIn(name, reversed_names)
+
+    def test_command(self):
+        stdout = StringIO()
+        call_command('warmup', stdout=stdout)
+        self.assertIn('Шаблонов:', stdout.getvalue())
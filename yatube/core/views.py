@@ -1,5 +1,11 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
 
+from . import metrics
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -7,3 +13,20 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def prometheus_metrics(request):
+    """Метрики страниц в текстовом формате Prometheus.
+
+    Отдаются только с заголовком Authorization: Bearer METRICS_TOKEN.
+    REMOTE_ADDR за обратным прокси - адрес самого прокси, поэтому
+    доступ по адресу открыл бы метрики всем.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    given = request.META.get('HTTP_AUTHORIZATION', '')
+    if not token or not hmac.compare_digest(
+            given.encode(), f'Bearer {token}'.encode()):
+        raise Http404
+    return HttpResponse(
+        metrics.render(metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8')
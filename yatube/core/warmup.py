@@ -0,0 +1,136 @@
+"""Прогрев процесса до первого запроса.
+
+Свежий воркер на первом запросе читает и разбирает шаблоны, собирает
+таблицы reverse() для URL и импортирует движок миниатюр sorl, поэтому
+первый ответ после деплоя заметно медленнее сотого. warmup() делает
+это заранее: компилирует все шаблоны проекта (с cached-загрузчиком они
+остаются в памяти процесса), вызывает reverse() для каждого имени
+маршрута, загружает движок, хранилище и kvstore sorl и каталоги
+переводов.
+
+wsgi.py и asgi.py вызывают warmup() при старте, если не задано
+YATUBE_WARMUP=0; с gunicorn --preload прогрев делается один раз в
+мастере до fork. Команда warmup делает то же и печатает отчёт.
+"""
+import os
+import time
+import uuid
+
+from django.conf import settings
+from django.template import engines
+from django.urls import NoReverseMatch, converters, get_resolver, reverse
+from django.utils import translation
+
+SAMPLE_VALUES = {
+    converters.IntConverter: 1,
+    converters.UUIDConverter: uuid.UUID(int=0),
+}
+DEFAULT_SAMPLE = 'warmup'
+
+
+def _project_dirs(engine):
+    base = str(settings.BASE_DIR)
+    return [str(directory) for directory in engine.template_dirs
+            if str(directory).startswith(base)]
+
+
+def template_names(engine):
+    """Имена всех шаблонов в каталогах проекта этого шаблонизатора."""
+    names = set()
+    for directory in _project_dirs(engine):
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                names.add(os.path.relpath(path, directory).replace(
+                    os.sep, '/'))
+    return sorted(names)
+
+
+def compile_templates():
+    """Компилирует шаблоны проекта; (имена, ошибки по именам)."""
+    compiled, errors = [], {}
+    for engine in engines.all():
+        for name in template_names(engine):
+            try:
+                engine.get_template(name)
+            except Exception as error:
+                errors[name] = f'{type(error).__name__}: {error}'
+            else:
+                compiled.append(name)
+    return compiled, errors
+
+
+def url_names(resolver=None, prefix=''):
+    """Пары (полное имя маршрута, возможные наборы kwargs)."""
+    resolver = resolver or get_resolver()
+    for name in resolver.reverse_dict:
+        if not isinstance(name, str):
+            continue
+        variants = []
+        for possibilities, _, defaults, url_converters in (
+                resolver.reverse_dict.getlist(name)):
+            for _, params in possibilities:
+                variants.append({
+                    param: SAMPLE_VALUES.get(
+                        type(url_converters.get(param)), DEFAULT_SAMPLE)
+                    for param in params if param not in defaults
+                })
+        yield prefix + name, variants
+    for namespace, (_, child) in resolver.namespace_dict.items():
+        yield from url_names(child, f'{prefix}{namespace}:')
+
+
+def reverse_urls():
+    """reverse() для каждого имени маршрута; (успешные, пропущенные).
+
+    Пропускаются маршруты на регулярных выражениях, которым не
+    подходят подставленные значения; их таблицы reverse() всё равно
+    уже собраны.
+    """
+    reversed_names, skipped = [], []
+    for name, variants in url_names():
+        for kwargs in variants or [{}]:
+            try:
+                reverse(name, kwargs=kwargs)
+            except NoReverseMatch:
+                continue
+            reversed_names.append(name)
+            break
+        else:
+            skipped.append(name)
+    return reversed_names, skipped
+
+
+def load_thumbnail_engine():
+    """Импортирует движок, хранилище и kvstore sorl.thumbnail."""
+    from sorl.thumbnail import default
+
+    return [type(getattr(default, name)).__name__
+            for name in ('engine', 'storage', 'kvstore', 'backend')]
+
+
+def load_translations():
+    """Загружает каталоги переводов LANGUAGE_CODE всех приложений."""
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('warmup')
+
+
+def warmup():
+    """Прогревает процесс и возвращает отчёт о сделанном."""
+    report = {}
+    started = time.perf_counter()
+    templates, template_errors = compile_templates()
+    report['templates'] = {'compiled': len(templates),
+                           'errors': template_errors}
+    names, skipped = reverse_urls()
+    report['urls'] = {'reversed': len(names), 'skipped': skipped}
+    report['thumbnail'] = load_thumbnail_engine()
+    load_translations()
+    report['seconds'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def warmup_on_startup():
+    """Прогрев из wsgi.py и asgi.py; YATUBE_WARMUP=0 отключает его."""
+    if os.environ.get('YATUBE_WARMUP', '1') != '0':
+        warmup()
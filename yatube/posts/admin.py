@@ -1,4 +1,7 @@
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
+
+from . import search
 from .models import Post, Group, Follow
 
 
@@ -15,6 +18,15 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице."""
+        expression = search.match_expression(search_term)
+        if expression is None or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term)
+        matching = RawSQL(*search.matching_ids_sql(expression))
+        return queryset.filter(pk__in=matching), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
@@ -0,0 +1,108 @@
+"""Кэш страниц с версиями вместо короткого TTL.
+
+Ключ закэшированной страницы включает версии её областей (scope):
+'posts' для ленты, 'group:<slug>', 'author:<username>'. Сигналы
+изменения постов, групп, комментариев и подписок увеличивают версии,
+поэтому страница обновляется сразу, а старые копии истекают сами.
+Страница на промахе строится по основной базе, а не по реплике: копия
+живёт PAGE_CACHE_TIMEOUT, и отставшие строки под свежей версией
+держались бы всё это время.
+"""
+import time
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import (
+    get_cache_key, has_vary_header, learn_cache_key, patch_vary_headers,
+)
+
+from core import db_routing, metrics
+
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+VERSION_KEY = 'posts:page_version:{}'
+
+
+def _initial_version():
+    # Версия не начинается с 1: если ключ версии вытеснен из кэша,
+    # новая версия не совпадёт со старыми копиями страниц.
+    return int(time.time() * 1000)
+
+
+def get_versions(scopes):
+    keys = [VERSION_KEY.format(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: _initial_version() for key in keys
+               if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    """Делает устаревшими страницы перечисленных областей."""
+    for scope in scopes:
+        key = VERSION_KEY.format(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _initial_version(), None)
+
+
+def bump_on_commit(*scopes):
+    """bump после коммита текущей транзакции.
+
+    Сигналы моделей срабатывают внутри транзакции записи. Новая версия
+    до коммита дала бы параллельному GET закэшировать старые строки
+    под ней, а при откате осталась бы зря.
+    """
+    transaction.on_commit(lambda: bump(*scopes))
+
+
+def _cached_response(request, prefix):
+    cache_key = get_cache_key(request, prefix, 'GET', cache=cache)
+    response = None if cache_key is None else cache.get(cache_key)
+    metrics.record_cache(response is not None)
+    return response
+
+
+def _store_response(request, response, prefix, timeout):
+    patch_vary_headers(response, ('Cookie',))
+    if (response.status_code != 200 or response.streaming
+            or 'private' in response.get('Cache-Control', ())):
+        return
+    if (not request.COOKIES and response.cookies
+            and has_vary_header(response, 'Cookie')):
+        return
+    cache_key = learn_cache_key(
+        request, response, timeout, prefix, cache=cache)
+    cache.set(cache_key, response, timeout)
+
+
+def versioned_cache_page(key_prefix, scopes, timeout=PAGE_CACHE_TIMEOUT):
+    """Как cache_page, но ключ страницы зависит от версий scopes.
+
+    scopes(request, *args, **kwargs) возвращает список областей.
+    Ответ зависит от Cookie, поэтому страницы авторизованных
+    пользователей кэшируются отдельно от анонимных. Страницы группы
+    и автора подключаются так же:
+
+        @versioned_cache_page(
+            'group_page', lambda request, slug: [f'group:{slug}'])
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            versions = get_versions(scopes(request, *args, **kwargs))
+            prefix = '.'.join([key_prefix, *map(str, versions)])
+            response = _cached_response(request, prefix)
+            if response is None:
+                with db_routing.use_primary():
+                    response = view(request, *args, **kwargs)
+                _store_response(request, response, prefix, timeout)
+            return response
+        return wrapper
+    return decorator
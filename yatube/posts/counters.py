@@ -0,0 +1,157 @@
+"""Хранимые счётчики постов, комментариев и подписок.
+
+Счётчики меняются через F() в той же транзакции, что и сама запись,
+поэтому страницы читают готовые значения вместо COUNT(*).
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _add(queryset, delta, *fields):
+    if delta < 0:
+        # Счётчики PositiveIntegerField: после рассинхронизации уход
+        # ниже нуля дал бы IntegrityError вместо удаления.
+        values = {field: Greatest(F(field) + delta, 0) for field in fields}
+    else:
+        values = {field: F(field) + delta for field in fields}
+    queryset.update(**values)
+
+
+def stats_for(user):
+    """Счётчики пользователя.
+
+    Строку создают сигнал user_saved, миграция 0003 и recount_counters.
+    Если её всё же нет, счётчики считаются на лету и не сохраняются:
+    GET ничего не пишет в базу.
+    """
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        stats = UserStats(
+            user=user,
+            posts_count=Post.objects.filter(author=user).count(),
+            followers_count=Follow.objects.filter(author=user).count(),
+            following_count=Follow.objects.filter(user=user).count(),
+        )
+        user.stats = stats
+        return stats
+
+
+def post_added(author_id, group_id):
+    UserStats.objects.get_or_create(user_id=author_id)
+    _add(UserStats.objects.filter(user_id=author_id), 1, 'posts_count')
+    if group_id is not None:
+        _add(Group.objects.filter(pk=group_id), 1, 'posts_count')
+
+
+def post_removed(author_id, group_id):
+    _add(UserStats.objects.filter(user_id=author_id), -1, 'posts_count')
+    if group_id is not None:
+        _add(Group.objects.filter(pk=group_id), -1, 'posts_count')
+
+
+def post_moved(old_group_id, new_group_id):
+    if old_group_id == new_group_id:
+        return
+    if old_group_id is not None:
+        _add(Group.objects.filter(pk=old_group_id), -1, 'posts_count')
+    if new_group_id is not None:
+        _add(Group.objects.filter(pk=new_group_id), 1, 'posts_count')
+
+
+def comment_added(post_id, delta=1):
+    _add(Post.objects.filter(pk=post_id), delta, 'comments_count')
+
+
+def follow_added(user_id, author_id, delta=1):
+    # При каскадном удалении пользователя его счётчики уже удалены,
+    # и создавать их заново, чтобы уменьшить, нельзя.
+    if delta > 0:
+        for user_id_ in (user_id, author_id):
+            UserStats.objects.get_or_create(user_id=user_id_)
+    _add(UserStats.objects.filter(user_id=user_id), delta, 'following_count')
+    _add(UserStats.objects.filter(user_id=author_id), delta,
+         'followers_count')
+
+
+def _count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(n=Count('pk')).values('n'),
+        output_field=IntegerField(),
+    ), 0)
+
+
+def _create_missing_stats(batch_size):
+    """Создаёт недостающие строки UserStats пачками по batch_size."""
+    last_pk = 0
+    while True:
+        user_ids = list(
+            User.objects.filter(
+                pk__gt=last_pk, stats__isnull=True
+            ).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        if not user_ids:
+            return
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=user_id) for user_id in user_ids],
+            ignore_conflicts=True,
+        )
+        last_pk = user_ids[-1]
+
+
+def _recount(queryset, target, counts, batch_size):
+    """Пересчитывает счётчики пачками по batch_size объектов."""
+    last_pk = 0
+    total = 0
+    while True:
+        batch = list(
+            queryset.filter(pk__gt=last_pk).order_by('pk').annotate(
+                **{f'actual_{name}': expr for name, expr in counts.items()}
+            )[:batch_size]
+        )
+        if not batch:
+            return total
+        rows = []
+        for obj in batch:
+            row = target(obj)
+            for name in counts:
+                setattr(row, name, getattr(obj, f'actual_{name}'))
+            rows.append(row)
+        type(rows[0]).objects.bulk_update(rows, list(counts))
+        last_pk = batch[-1].pk
+        total += len(batch)
+
+
+def recount_all(batch_size=1000, posts=None):
+    """Пересчитывает все счётчики; возвращает число объектов по типам.
+
+    posts - queryset постов, у которых мог измениться comments_count,
+    если пересчитывать все посты незачем.
+    """
+    if posts is None:
+        posts = Post.objects.all()
+    _create_missing_stats(batch_size)
+    return {
+        'users': _recount(
+            User.objects.select_related('stats'),
+            lambda user: user.stats,
+            {
+                'posts_count': _count(Post, 'author'),
+                'followers_count': _count(Follow, 'author'),
+                'following_count': _count(Follow, 'user'),
+            },
+            batch_size,
+        ),
+        'groups': _recount(
+            Group.objects.all(), lambda group: group,
+            {'posts_count': _count(Post, 'group')}, batch_size,
+        ),
+        'posts': _recount(
+            posts, lambda post: post,
+            {'comments_count': _count(Comment, 'post')}, batch_size,
+        ),
+    }
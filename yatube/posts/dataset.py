@@ -0,0 +1,123 @@
+"""Синтетические данные для замеров и проверки планов запросов.
+
+Данные пишутся пачками через bulk_create в обход сигналов, а счётчики
+и ленты подписок затем пересчитываются целиком - так наполнение
+большой базы занимает секунды, а не минуты.
+"""
+import random
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from faker import Faker
+
+from . import counters, feed
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+# Кэш на время test_database: общий файловый кэш из настроек получил
+# бы карточки, версии и подписки, построенные по строкам тестовой базы.
+LOCAL_CACHES = {'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'yatube-dataset',
+}}
+
+SIZES = {
+    'small': {'users': 20, 'groups': 5, 'posts': 200,
+              'follows': 5, 'comments': 20},
+    'medium': {'users': 200, 'groups': 20, 'posts': 5000,
+               'follows': 20, 'comments': 100},
+    'large': {'users': 1000, 'groups': 50, 'posts': 50000,
+              'follows': 50, 'comments': 500},
+}
+
+
+@contextmanager
+def test_database(name=None, caches=None):
+    """Временная тестовая база и отдельный кэш на время блока.
+
+    Тестовое окружение нужно, чтобы в ответах клиента был
+    response.context. name - файл базы; по умолчанию тестовая база
+    SQLite создаётся в памяти. caches - настройка CACHES на время
+    блока, по умолчанию LOCAL_CACHES в памяти процесса.
+    """
+    old_name = connection.settings_dict['NAME']
+    test_settings = connection.settings_dict.setdefault('TEST', {})
+    old_test_name = test_settings.get('NAME')
+    if name is not None:
+        test_settings['NAME'] = name
+    cache_settings = override_settings(CACHES=caches or LOCAL_CACHES)
+    cache_settings.enable()
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        test_settings['NAME'] = old_test_name
+        teardown_test_environment()
+        cache_settings.disable()
+
+
+def seed(users, groups, posts, follows, comments, random_seed=0):
+    """Наполняет базу и возвращает объекты, на которых удобно мерить.
+
+    follows - число подписок у каждого пользователя, comments - число
+    комментариев у самого нового поста.
+    """
+    rng = random.Random(random_seed)
+    fake = Faker('ru_RU')
+    fake.seed_instance(random_seed)
+
+    User.objects.bulk_create(
+        User(username=f'user{number}', first_name=fake.first_name(),
+             last_name=fake.last_name(), password='!')
+        for number in range(users)
+    )
+    Group.objects.bulk_create(
+        Group(title=fake.sentence(nb_words=3)[:200], slug=f'group-{number}',
+              description=fake.paragraph())
+        for number in range(groups)
+    )
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    group_ids = list(Group.objects.values_list('pk', flat=True))
+    Post.objects.bulk_create(
+        (Post(author_id=rng.choice(user_ids),
+              group_id=rng.choice(group_ids + [None]),
+              text=fake.paragraph(nb_sentences=5))
+         for _ in range(posts)),
+        batch_size=BATCH_SIZE,
+    )
+    Follow.objects.bulk_create(
+        (Follow(user_id=user_id, author_id=author_id)
+         for user_id in user_ids
+         for author_id in rng.sample(user_ids, min(follows, len(user_ids)))
+         if author_id != user_id),
+        batch_size=BATCH_SIZE,
+    )
+    post = Post.objects.order_by('-pub_date', '-pk').first()
+    Comment.objects.bulk_create(
+        (Comment(post=post, author_id=rng.choice(user_ids),
+                 text=fake.sentence())
+         for _ in range(comments)),
+        batch_size=BATCH_SIZE,
+    )
+
+    counters.recount_all()
+    feed.rebuild_all()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    reader = User.objects.get(pk=user_ids[0])
+    return {
+        'reader': reader,
+        'author': reader.follower.first().author,
+        'stranger': User.objects.exclude(
+            pk=reader.pk).exclude(following__user=reader).first(),
+        'group': Group.objects.get(pk=group_ids[0]),
+        'post': post,
+    }
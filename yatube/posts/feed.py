@@ -0,0 +1,174 @@
+"""Лента подписок с раздачей постов при записи (fan-out on write).
+
+Новый пост сразу раскладывается по лентам подписчиков автора, поэтому
+страница follow_index читает готовый упорядоченный список из FeedEntry.
+Посты авторов с очень большим числом подписчиков не раздаются, а
+подмешиваются в ленту при чтении (fan-out on read). Их ищут среди
+подписок из follow_graph запросом user_id IN (...) к UserStats, без
+соединения с Follow, а их посты - по author_id IN (...) и индексу
+(author, pub_date). Когда подписчиков снова становится не больше
+FEED_FANOUT_MAX_FOLLOWERS, последние посты автора раздаются заново:
+написанные в режиме чтения иначе пропали бы из лент.
+"""
+from collections import defaultdict
+
+from django.db.models import F, Q
+
+from . import follow_graph
+from .models import FeedEntry, Follow, Post, UserStats
+
+FEED_BACKFILL_SIZE = 100
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_BATCH_SIZE = 500
+
+
+def is_pull_author(author_id):
+    """Посты автора подмешиваются при чтении, а не раздаются."""
+    return UserStats.objects.filter(
+        user_id=author_id,
+        followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS,
+    ).exists()
+
+
+def fan_out_post(post):
+    """Раскладывает новый пост по лентам подписчиков автора."""
+    if is_pull_author(post.author_id):
+        return
+    follower_ids = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=post.pk, pub_date=post.pub_date)
+         for user_id in follower_ids.iterator()),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние посты автора после подписки."""
+    if is_pull_author(author_id):
+        return
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:FEED_BACKFILL_SIZE]
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for pk, pub_date in posts),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def restore_push(author_id):
+    """Раздаёт последние посты автора, который перестал быть pull-автором.
+
+    Вызывается после уменьшения followers_count; переход происходит на
+    отписке, после которой подписчиков ровно FEED_FANOUT_MAX_FOLLOWERS.
+    """
+    if not UserStats.objects.filter(
+        user_id=author_id,
+        followers_count=FEED_FANOUT_MAX_FOLLOWERS,
+    ).exists():
+        return
+    posts = list(Post.objects.filter(author_id=author_id).order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'pub_date')[:FEED_BACKFILL_SIZE])
+    follower_ids = Follow.objects.filter(
+        author_id=author_id
+    ).values_list('user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for user_id in follower_ids.iterator()
+         for pk, pub_date in posts),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты посты автора после отписки."""
+    FeedEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id,
+    ).delete()
+
+
+def pull_author_ids(user_id):
+    """Авторы из подписок user, чьи посты читаются напрямую."""
+    author_ids = follow_graph.following_ids(user_id)
+    if not author_ids:
+        return []
+    return list(UserStats.objects.filter(
+        user_id__in=list(author_ids),
+        followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS,
+    ).values_list('user_id', flat=True))
+
+
+def feed_posts(user_id):
+    """Посты ленты подписок user в порядке от новых к старым.
+
+    Ключ сортировки (feed_pub_date, feed_post_id) подходит для
+    CursorPaginator и для индекса FeedEntry (user, pub_date, post).
+    """
+    pulled = pull_author_ids(user_id)
+    if not pulled:
+        return Post.objects.filter(
+            feed_entries__user_id=user_id
+        ).annotate(
+            feed_pub_date=F('feed_entries__pub_date'),
+            feed_post_id=F('feed_entries__post_id'),
+        ).order_by('-feed_pub_date', '-feed_post_id')
+    inbox = FeedEntry.objects.filter(user_id=user_id).values('post_id')
+    return Post.objects.filter(
+        Q(pk__in=inbox) | Q(author_id__in=pulled)
+    ).annotate(
+        feed_pub_date=F('pub_date'),
+        feed_post_id=F('pk'),
+    ).order_by('-feed_pub_date', '-feed_post_id')
+
+
+def rebuild(user_id):
+    """Пересобирает ленту user по текущим подпискам."""
+    FeedEntry.objects.filter(user_id=user_id).delete()
+    author_ids = Follow.objects.filter(
+        user_id=user_id
+    ).values_list('author_id', flat=True)
+    for author_id in author_ids:
+        backfill(user_id, author_id)
+
+
+def fill(post_model, follow_model, entry_model, pulled=()):
+    """Раскладывает последние посты авторов по лентам подписчиков.
+
+    Модели передаются параметрами, чтобы миграция могла вызвать fill
+    со своими историческими моделями. pulled - id авторов, чьи посты
+    читаются напрямую и не раздаются.
+    """
+    latest = defaultdict(list)
+    for pk, author_id, pub_date in post_model.objects.order_by(
+        '-pub_date', '-pk'
+    ).values_list('pk', 'author_id', 'pub_date').iterator():
+        if len(latest[author_id]) < FEED_BACKFILL_SIZE:
+            latest[author_id].append((pk, pub_date))
+    entry_model.objects.bulk_create(
+        (entry_model(user_id=user_id, post_id=pk, pub_date=pub_date)
+         for user_id, author_id in follow_model.objects.values_list(
+             'user_id', 'author_id').iterator()
+         if author_id not in pulled
+         for pk, pub_date in latest[author_id]),
+        batch_size=FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def rebuild_all():
+    """Дополняет ленты всех подписчиков одной пачкой вставок.
+
+    То же, что rebuild для каждого, но без удаления и запроса на
+    каждую подписку; нужно после загрузки данных в обход сигналов.
+    """
+    pulled = set(Follow.objects.filter(
+        author__stats__followers_count__gt=FEED_FANOUT_MAX_FOLLOWERS
+    ).values_list('author_id', flat=True))
+    fill(Post, Follow, FeedEntry, pulled)
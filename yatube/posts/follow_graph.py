@@ -0,0 +1,71 @@
+"""Подписки пользователя в кэше: отсортированный массив id авторов.
+
+profile проверяет подписку на каждом показе страницы, а лента ищет
+среди подписок авторов, чьи посты читаются напрямую. Вместо запроса к
+Follow оба читают из кэша array('q') с id авторов по возрастанию:
+проверка - двоичный поиск, а список идёт в author_id IN (...).
+
+Сигналы Follow после коммита удаляют массив из кэша, как
+cache.bump_on_commit меняет версии страниц: при подписке, отписке и
+каскадном удалении подписки. Массив строится заново одним запросом
+при следующем чтении, и строится по основной базе: отставшая реплика
+вернула бы подписки до последнего изменения. Загрузки в обход
+сигналов (transfer) сбрасывают ключи через forget.
+"""
+from array import array
+from bisect import bisect_left
+
+from django.core.cache import cache
+from django.db import transaction
+
+from core import db_routing
+
+from .models import Follow
+
+FOLLOWING_KEY = 'posts:following:{}'
+# Страховка от рассинхронизации, например если кэш был недоступен
+# в момент удаления ключа.
+FOLLOWING_CACHE_TIMEOUT = 60 * 60 * 6
+
+
+def _key(user_id):
+    return FOLLOWING_KEY.format(user_id)
+
+
+def _author_ids(user_id):
+    return Follow.objects.filter(user_id=user_id).order_by(
+        'author_id').values_list('author_id', flat=True)
+
+
+def _contains(ids, author_id):
+    index = bisect_left(ids, author_id)
+    return index < len(ids) and ids[index] == author_id
+
+
+def following_ids(user_id):
+    """id авторов, на которых подписан user, по возрастанию."""
+    ids = cache.get(_key(user_id))
+    if ids is None:
+        with db_routing.use_primary():
+            ids = array('q', _author_ids(user_id))
+        cache.set(_key(user_id), ids, FOLLOWING_CACHE_TIMEOUT)
+    return ids
+
+
+def is_following(user_id, author_id):
+    return _contains(following_ids(user_id), author_id)
+
+
+def forget_on_commit(user_id):
+    """Сбрасывает массив user после коммита текущей транзакции.
+
+    Правка массива на месте (get, вставка, set) не атомарна: из двух
+    параллельных изменений одно терялось бы, а до коммита в кэш
+    попадали бы подписки, которых после отката нет.
+    """
+    transaction.on_commit(lambda: cache.delete(_key(user_id)))
+
+
+def forget(user_ids):
+    """Сбрасывает массивы: подписки менялись в обход сигналов."""
+    cache.delete_many([_key(user_id) for user_id in set(user_ids)])
@@ -0,0 +1,69 @@
+"""ETag страниц поста, автора и группы для условных GET-запросов.
+
+Метка свежести читается одним запросом по индексам до основной
+работы страницы; при совпадении с If-None-Match декоратор condition
+отвечает 304 без рендера. Страница зависит от зрителя (кнопки
+редактирования и подписки), поэтому в метку входит id пользователя,
+а в метку автора - ещё и подписан ли на него зритель: число
+подписчиков не меняется, если один подписался, а другой отписался.
+Формы страниц несут {% csrf_token %}, поэтому в метку входит и
+CSRF-cookie: после нового входа секрет меняется, и 304 со старой
+копией страницы дал бы 403 на отправке формы.
+Last-Modified не отдаётся: по одной дате нельзя отличить ответ
+другому зрителю.
+"""
+import hashlib
+
+from django.db.models import OuterRef, Subquery
+
+from . import follow_graph
+from .models import Comment, Group, Post, User
+
+
+def _etag(request, *parts):
+    viewer = request.user.pk if request.user.is_authenticated else None
+    raw = repr((viewer, request.META.get('CSRF_COOKIE'), *parts)).encode()
+    return hashlib.md5(raw).hexdigest()
+
+
+def _latest(model, field, **filters):
+    """Подзапрос самого позднего значения field среди строк filters."""
+    return Subquery(
+        model.objects.filter(**filters).order_by(
+            f'-{field}').values(field)[:1]
+    )
+
+
+def post_etag(request, post_id):
+    stamp = Post.objects.filter(pk=post_id).annotate(
+        last_comment=_latest(Comment, 'created', post=OuterRef('pk')),
+    ).order_by().values_list(
+        'updated', 'comments_count', 'last_comment',
+        'author__stats__posts_count',
+    ).first()
+    return stamp and _etag(request, 'post', *stamp)
+
+
+def _following(request, author_id):
+    return (request.user.is_authenticated
+            and follow_graph.is_following(request.user.pk, author_id))
+
+
+def profile_etag(request, username):
+    stamp = User.objects.filter(username=username).annotate(
+        last_updated=_latest(Post, 'updated', author=OuterRef('pk')),
+    ).values_list(
+        'pk', 'first_name', 'last_name', 'last_updated',
+        'stats__posts_count', 'stats__followers_count',
+    ).first()
+    return stamp and _etag(
+        request, 'profile', *stamp, _following(request, stamp[0]))
+
+
+def group_etag(request, slug):
+    stamp = Group.objects.filter(slug=slug).annotate(
+        last_updated=_latest(Post, 'updated', group=OuterRef('pk')),
+    ).values_list(
+        'pk', 'title', 'description', 'last_updated', 'posts_count',
+    ).first()
+    return stamp and _etag(request, 'group', *stamp)
@@ -0,0 +1,107 @@
+"""Приём картинок постов: уменьшение, поворот по EXIF и пересжатие.
+
+Картинки показываются не больше 960x339, а загружаются оригиналы с
+камер на несколько мегабайт. Перед записью в хранилище картинка
+уменьшается до POST_IMAGE_MAX_SIZE, поворачивается по тегу Orientation
+и пересжимается с POST_IMAGE_QUALITY без EXIF и прочих метаданных.
+JPEG декодируется сразу в уменьшенном масштабе (draft), а результат
+пишется во временный файл, который уходит на диск, если он больше
+SPOOL_MAX_SIZE, - так большая загрузка не копируется в память целиком.
+"""
+import logging
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+logger = logging.getLogger(__name__)
+
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+POST_IMAGE_QUALITY = 85
+SPOOL_MAX_SIZE = 1024 * 1024
+METADATA_KEYS = ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+FORMATS = {'JPEG': 'JPEG', 'MPO': 'JPEG', 'PNG': 'PNG', 'WEBP': 'WEBP',
+           'GIF': 'GIF'}
+
+
+def _max_size():
+    return getattr(settings, 'POST_IMAGE_MAX_SIZE', POST_IMAGE_MAX_SIZE)
+
+
+def _quality():
+    return getattr(settings, 'POST_IMAGE_QUALITY', POST_IMAGE_QUALITY)
+
+
+def needs_ingest(image):
+    """Картинку надо обработать: она велика или несёт метаданные."""
+    max_width, max_height = _max_size()
+    width, height = image.size
+    return (width > max_width or height > max_height
+            or any(key in image.info for key in METADATA_KEYS))
+
+
+def _save_options(image, image_format):
+    options = {}
+    if image.info.get('icc_profile'):
+        options['icc_profile'] = image.info['icc_profile']
+    if image_format == 'JPEG':
+        options.update(quality=_quality(), optimize=True, progressive=True)
+    elif image_format == 'WEBP':
+        options.update(quality=_quality(), method=4)
+    elif image_format in ('PNG', 'GIF'):
+        options['optimize'] = True
+    return options
+
+
+def ingest(content):
+    """Обработанная копия загруженной картинки или None.
+
+    None - картинку можно сохранить как есть: она уже не больше
+    POST_IMAGE_MAX_SIZE и без метаданных, анимирована или её формат
+    здесь не пересжимается.
+    """
+    # PIL нужен только при загрузке картинки, а модуль импортируется
+    # с posts.models в каждом процессе.
+    from PIL import Image, ImageOps
+
+    content.seek(0)
+    image = Image.open(content)
+    image_format = FORMATS.get(image.format)
+    if (image_format is None or getattr(image, 'is_animated', False)
+            or not needs_ingest(image)):
+        return None
+    max_size = _max_size()
+    if image_format == 'JPEG':
+        # Декодирование сразу в 1/2, 1/4 или 1/8 размера. Сторона
+        # квадратная, чтобы хватило и после поворота по EXIF.
+        side = max(max_size)
+        image.draft('RGB', (side, side))
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail(max_size, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    output = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    image.save(output, image_format, **_save_options(image, image_format))
+    output.seek(0)
+    return File(output, name=content.name)
+
+
+class IngestingStorage(FileSystemStorage):
+    """Хранилище картинок постов: перед записью пропускает их через ingest.
+
+    Обработка в хранилище, а не в поле модели, поэтому Post.image
+    остаётся обычным ImageField, а картинки из формы, админки и
+    reprocess_images обрабатываются одинаково.
+    """
+
+    def _save(self, name, content):
+        try:
+            processed = ingest(content)
+        except Exception:
+            logger.exception('Не удалось обработать картинку %s', name)
+            processed = None
+        if processed is not None:
+            content = processed
+        content.seek(0)
+        return super()._save(name, content)
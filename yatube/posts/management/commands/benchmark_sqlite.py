@@ -0,0 +1,190 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import (DEFAULT_DB_ALIAS, OperationalError,
+                       close_old_connections, connections)
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from core import benchmark
+from core.backends.sqlite3 import base as sqlite
+from posts import dataset
+
+PROFILES = ('default', 'wal', 'tuned')
+
+
+def profile_settings(name):
+    """Настройки профиля: PRAGMA, режим BEGIN и CONN_MAX_AGE.
+
+    default - как у стандартного бэкенда: журнал отката, BEGIN DEFERRED
+    и соединение на запрос; wal - PRAGMA из SQLITE_PRAGMAS; tuned - они
+    же, SQLITE_TRANSACTION_MODE и переиспользование соединений.
+    """
+    if name == 'default':
+        return {}, 'DEFERRED', 0
+    if name == 'wal':
+        return sqlite.get_pragmas(), 'DEFERRED', 0
+    return (sqlite.get_pragmas(), sqlite.get_transaction_mode(),
+            settings.CONN_MAX_AGE or 60)
+
+
+def request_cases(fixtures):
+    """Запросы воркеров: вид -> [(метод, url, данные)]."""
+    post = fixtures['post']
+    return {
+        'read': [
+            ('get', reverse('posts:index'), None),
+            ('get', reverse('posts:post_detail', args=[post.pk]), None),
+            ('get', reverse('posts:profile',
+                            args=[fixtures['author'].username]), None),
+        ],
+        'write': [
+            ('post', reverse('posts:add_comment', args=[post.pk]),
+             {'text': 'Комментарий для замера'}),
+            ('post', reverse('posts:post_create'),
+             {'text': 'Пост для замера'}),
+        ],
+    }
+
+
+def worker(cases, session_key, requests, writes, seed):
+    """Поток-воркер: requests запросов, доля записей writes.
+
+    Как у gunicorn с gthread: у потока свои соединения с базой, после
+    каждого запроса close_old_connections закрывает их, если
+    CONN_MAX_AGE истёк.
+    """
+    client = Client()
+    client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+    rng = random.Random(seed)
+    samples = {'read': [], 'write': []}
+    errors = 0
+    try:
+        for _ in range(requests):
+            kind = 'write' if rng.random() < writes else 'read'
+            method, url, data = rng.choice(cases[kind])
+            started = time.perf_counter()
+            try:
+                response = getattr(client, method)(url, data)
+                ok = response.status_code < 500
+            except OperationalError:
+                ok = False
+            elapsed = time.perf_counter() - started
+            close_old_connections()
+            if ok:
+                samples[kind].append(elapsed * 1000)
+            else:
+                errors += 1
+    finally:
+        connections.close_all()
+    return samples, errors
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность и задержки SQLite при '
+            'параллельных чтениях и записях без настройки, с WAL и с '
+            'полной настройкой core.backends.sqlite3')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', nargs='+', choices=PROFILES,
+            default=list(PROFILES))
+        parser.add_argument(
+            '--size', choices=list(dataset.SIZES), default='small',
+            help='Размер данных из posts.dataset.SIZES',
+        )
+        parser.add_argument(
+            '--threads', type=int, nargs='+', default=[1, 4, 16],
+            help='Число потоков-воркеров',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=100,
+            help='Число запросов на поток',
+        )
+        parser.add_argument(
+            '--writes', type=float, default=0.2,
+            help='Доля запросов на запись (add_comment, post_create)',
+        )
+        parser.add_argument(
+            '--output', help='Файл результатов; по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        if not 0 <= options['writes'] <= 1:
+            raise CommandError('--writes должен быть от 0 до 1')
+        if not isinstance(connections[DEFAULT_DB_ALIAS],
+                          sqlite.DatabaseWrapper):
+            raise CommandError(
+                'Замер только для бэкенда core.backends.sqlite3')
+        results = {
+            'environment': benchmark.environment(),
+            'settings': {key: options[key] for key in (
+                'size', 'requests', 'writes')},
+            'results': [],
+        }
+        for profile in options['profiles']:
+            for threads in options['threads']:
+                result = self.measure(profile, threads, options)
+                results['results'].append(result)
+                self.stderr.write(
+                    f'{profile:<8} x{threads:<3} '
+                    f'{result["rps"]:>8.1f} запросов/с  '
+                    f'p99 чтения {result["read_ms"].get("p99", 0):>8.2f} ms  '
+                    f'p99 записи {result["write_ms"].get("p99", 0):>8.2f} ms  '
+                    f'ошибок {result["errors"]}')
+        benchmark.write_results(results, options['output'], self.stdout)
+
+    def measure(self, profile, threads, options):
+        """Один прогон на свежей базе в файле: журнал базы - её
+        свойство, и WAL прошлого прогона не должен достаться следующему."""
+        pragmas, transaction_mode, conn_max_age = profile_settings(profile)
+        directory = tempfile.mkdtemp(prefix='sqlite-benchmark-')
+        database = connections.databases[DEFAULT_DB_ALIAS]
+        old_conn_max_age = database.get('CONN_MAX_AGE', 0)
+        database['CONN_MAX_AGE'] = conn_max_age
+        caches = {'default': {
+            'BACKEND': 'core.cache.SQLiteCache',
+            'LOCATION': os.path.join(directory, 'cache.sqlite3'),
+        }}
+        try:
+            with override_settings(
+                    SQLITE_PRAGMAS=pragmas,
+                    SQLITE_TRANSACTION_MODE=transaction_mode), \
+                    dataset.test_database(
+                        os.path.join(directory, 'db.sqlite3'), caches):
+                fixtures = dataset.seed(**dataset.SIZES[options['size']])
+                client = Client()
+                client.force_login(fixtures['reader'])
+                session_key = client.session.session_key
+                cases = request_cases(fixtures)
+                started = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=threads) as pool:
+                    runs = list(pool.map(
+                        lambda seed: worker(
+                            cases, session_key, options['requests'],
+                            options['writes'], seed),
+                        range(threads)))
+                elapsed = time.perf_counter() - started
+        finally:
+            database['CONN_MAX_AGE'] = old_conn_max_age
+            shutil.rmtree(directory)
+        reads = [ms for samples, _ in runs for ms in samples['read']]
+        writes = [ms for samples, _ in runs for ms in samples['write']]
+        errors = sum(errors for _, errors in runs)
+        return {
+            'profile': profile,
+            'threads': threads,
+            'pragmas': pragmas,
+            'transaction_mode': transaction_mode,
+            'conn_max_age': conn_max_age,
+            'requests': len(reads) + len(writes) + errors,
+            'errors': errors,
+            'rps': round((len(reads) + len(writes)) / elapsed, 1),
+            'read_ms': benchmark.summarize(reads),
+            'write_ms': benchmark.summarize(writes),
+        }
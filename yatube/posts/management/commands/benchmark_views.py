@@ -0,0 +1,162 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import benchmark
+from posts import dataset
+from posts.models import Follow
+
+VIEWS = (
+    'index', 'group_list', 'profile', 'post_detail', 'follow_index',
+    'add_comment', 'profile_follow',
+)
+
+
+def view_cases(fixtures):
+    """Запросы для замера: имя -> (метод, url, данные, нужен ли вход,
+    подготовка перед каждым запросом)."""
+    reader, author = fixtures['reader'], fixtures['author']
+    stranger, post = fixtures['stranger'], fixtures['post']
+
+    def unfollow():
+        Follow.objects.filter(user=reader, author=stranger).delete()
+
+    return {
+        'index': ('get', reverse('posts:index'), None, False, None),
+        'group_list': (
+            'get', reverse('posts:group_list',
+                           args=[fixtures['group'].slug]),
+            None, False, None,
+        ),
+        'profile': (
+            'get', reverse('posts:profile', args=[author.username]),
+            None, False, None,
+        ),
+        'post_detail': (
+            'get', reverse('posts:post_detail', args=[post.pk]),
+            None, False, None,
+        ),
+        'follow_index': (
+            'get', reverse('posts:follow_index'), None, True, None),
+        'add_comment': (
+            'post', reverse('posts:add_comment', args=[post.pk]),
+            {'text': 'Комментарий для замера'}, True, None,
+        ),
+        'profile_follow': (
+            'get', reverse('posts:profile_follow', args=[stranger.username]),
+            None, True, unfollow,
+        ),
+    }
+
+
+class Command(BaseCommand):
+    help = ('Замеряет страницы через тестовый клиент на синтетических '
+            'данных заданных размеров и пишет результаты в JSON')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', nargs='+', choices=list(dataset.SIZES),
+            default=['small', 'medium'],
+            help='Размеры данных из posts.dataset.SIZES',
+        )
+        parser.add_argument(
+            '--views', nargs='+', choices=VIEWS, default=list(VIEWS))
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Число замеряемых запросов на страницу',
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=2,
+            help='Число запросов до замеров',
+        )
+        parser.add_argument(
+            '--warm-cache', action='store_true',
+            help='Не очищать кэш перед каждым запросом',
+        )
+        parser.add_argument(
+            '--output', help='Файл результатов; по умолчанию stdout')
+        parser.add_argument(
+            '--compare', help='Файл прошлых результатов для сравнения')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat должен быть больше нуля')
+        results = {
+            'environment': benchmark.environment(),
+            'settings': {
+                'repeat': options['repeat'],
+                'warmup': options['warmup'],
+                'warm_cache': options['warm_cache'],
+            },
+            'results': [],
+        }
+        for size in options['sizes']:
+            with dataset.test_database():
+                fixtures = dataset.seed(**dataset.SIZES[size])
+                cases = view_cases(fixtures)
+                for name in options['views']:
+                    result = self.measure(cases[name], fixtures, options)
+                    result.update(size=size, view=name)
+                    results['results'].append(result)
+                    self.stderr.write(
+                        f'{size:>8} {name:<15} '
+                        f'p50 {result["wall_ms"]["p50"]:>8.2f} ms  '
+                        f'запросов {result["queries"]["max"]}')
+        benchmark.write_results(results, options['output'], self.stdout)
+        if options['compare']:
+            self.compare(benchmark.load_results(options['compare']), results)
+
+    def measure(self, case, fixtures, options):
+        method, url, data, login, setup = case
+        client = Client()
+        if login:
+            client.force_login(fixtures['reader'])
+        request = getattr(client, method)
+        timings, query_counts, sizes, statuses = [], [], [], set()
+        for run in range(options['warmup'] + options['repeat']):
+            if setup is not None:
+                setup()
+            if not options['warm_cache']:
+                cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = request(url, data)
+                elapsed = time.perf_counter() - started
+            if run < options['warmup']:
+                continue
+            timings.append(elapsed * 1000)
+            query_counts.append(len(queries))
+            sizes.append(len(response.content))
+            statuses.add(response.status_code)
+        return {
+            'url': url,
+            'method': method.upper(),
+            'status': sorted(statuses),
+            'wall_ms': benchmark.summarize(timings),
+            'queries': benchmark.summarize(query_counts, digits=1),
+            'bytes': benchmark.summarize(sizes, digits=0),
+        }
+
+    def compare(self, old, new):
+        """Печатает изменение p50 по каждой паре (размер, страница)."""
+        previous = {(row['size'], row['view']): row
+                    for row in old['results']}
+        self.stderr.write(
+            f'Сравнение с {old["environment"].get("revision")}:')
+        for row in new['results']:
+            before = previous.get((row['size'], row['view']))
+            if before is None:
+                continue
+            old_p50 = before['wall_ms']['p50']
+            new_p50 = row['wall_ms']['p50']
+            change = (new_p50 - old_p50) / old_p50 * 100 if old_p50 else 0
+            self.stderr.write(
+                f'{row["size"]:>8} {row["view"]:<15} '
+                f'{old_p50:>8.2f} -> {new_p50:>8.2f} ms ({change:+.1f}%)  '
+                f'запросов {before["queries"]["max"]} -> '
+                f'{row["queries"]["max"]}')
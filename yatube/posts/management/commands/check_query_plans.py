@@ -0,0 +1,106 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import dataset
+
+
+def bad_steps(plan):
+    """Полные просмотры таблиц и сортировки во временном B-дереве.
+
+    Полнотекстовый поиск сортирует по вычисляемому bm25, такой
+    сортировке индекс не поможет - она допустима.
+    """
+    ranked = any('VIRTUAL TABLE' in step for step in plan)
+    bad = []
+    for step in plan:
+        if step.startswith('USE TEMP B-TREE') and not ranked:
+            bad.append(step)
+        elif (step.startswith('SCAN ') and 'USING' not in step
+              and 'VIRTUAL TABLE' not in step):
+            bad.append(step)
+    return bad
+
+
+class Command(BaseCommand):
+    help = ('Проверяет EXPLAIN QUERY PLAN запросов страниц на засеянной '
+            'тестовой базе: без полных просмотров таблиц и сортировок '
+            'во временном B-дереве')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--size', choices=list(dataset.SIZES), default='medium',
+            help='Размер засеваемых данных',
+        )
+        parser.add_argument(
+            '--verbose-plans', action='store_true',
+            help='Печатать планы всех запросов, а не только плохие',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('EXPLAIN QUERY PLAN проверяется для SQLite')
+        with dataset.test_database():
+            fixtures = dataset.seed(**dataset.SIZES[options['size']])
+            failures = self.check_views(fixtures, options['verbose_plans'])
+        if failures:
+            raise CommandError(f'Плохих планов запросов: {failures}')
+        self.stdout.write(self.style.SUCCESS('Все планы запросов в порядке'))
+
+    def urls(self, fixtures):
+        return [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[fixtures['group'].slug]),
+            reverse('posts:profile', args=[fixtures['author'].username]),
+            reverse('posts:post_detail', args=[fixtures['post'].pk]),
+            reverse('posts:follow_index'),
+            reverse('posts:search') + '?q=пост',
+        ]
+
+    def check_views(self, fixtures, verbose):
+        client = Client()
+        client.force_login(fixtures['reader'])
+        failures = 0
+        for url in self.urls(fixtures):
+            for page_url in self.pages(client, url):
+                failures += self.check_url(client, page_url, verbose)
+        return failures
+
+    def pages(self, client, url):
+        """Первая и вторая (по курсору) страницы url."""
+        cache.clear()
+        response = client.get(url)
+        yield url
+        page_obj = response.context and response.context.get('page_obj')
+        next_cursor = getattr(getattr(page_obj, 'paginator', None),
+                              'next_cursor', None)
+        if next_cursor:
+            separator = '&' if '?' in url else '?'
+            yield f'{url}{separator}cursor={next_cursor}'
+
+    def check_url(self, client, url, verbose):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        if response.status_code != 200:
+            self.stderr.write(f'{url}: статус {response.status_code}')
+            return 1
+        failures = 0
+        for query in queries:
+            sql = query['sql']
+            if not sql.lstrip().upper().startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+                plan = [row[-1] for row in cursor.fetchall()]
+            bad = bad_steps(plan)
+            if bad or verbose:
+                style = self.style.ERROR if bad else self.style.SQL_KEYWORD
+                self.stdout.write(style(f'{url}\n  {sql}'))
+                for step in plan:
+                    self.stdout.write(f'    {step}')
+            failures += bool(bad)
+        return failures
@@ -0,0 +1,33 @@
+import sys
+
+from django.core.management.base import BaseCommand
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, посты, комментарии и подписки '
+            'в JSONL')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Куда писать JSONL; "-" - в стандартный вывод',
+        )
+        parser.add_argument(
+            '--with-passwords', action='store_true',
+            help='Выгружать хэши паролей пользователей',
+        )
+
+    def handle(self, *args, **options):
+        if options['path'] == '-':
+            totals = transfer.export_jsonl(
+                self.stdout, options['with_passwords'])
+            report = sys.stderr
+        else:
+            with open(options['path'], 'w', encoding='utf-8') as stream:
+                totals = transfer.export_jsonl(
+                    stream, options['with_passwords'])
+            report = self.stdout
+        for model, total in totals.items():
+            report.write(f'{model}: {total}\n')
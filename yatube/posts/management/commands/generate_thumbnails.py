@@ -0,0 +1,28 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = 'Создаёт миниатюры картинок для уже опубликованных постов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько потоков создают миниатюры параллельно',
+        )
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.exclude(image='').order_by(
+            'pk').values_list('pk', flat=True)
+        done = failed = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for ok in pool.map(thumbnails.generate, post_ids.iterator()):
+                if ok:
+                    done += 1
+                else:
+                    failed += 1
+        self.stdout.write(f'Готово: {done}, ошибок: {failed}')
@@ -0,0 +1,34 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import transfer
+
+
+class Command(BaseCommand):
+    help = ('Загружает пользователей, группы, посты, комментарии и подписки '
+            'из JSONL, выгруженного export_posts')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Откуда читать JSONL; "-" - из стандартного ввода',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=transfer.BATCH_SIZE,
+            help='Сколько объектов записывать за одну транзакцию',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['path'] == '-':
+                totals = transfer.import_jsonl(
+                    sys.stdin, options['batch_size'])
+            else:
+                with open(options['path'], encoding='utf-8') as stream:
+                    totals = transfer.import_jsonl(
+                        stream, options['batch_size'])
+        except transfer.TransferError as error:
+            raise CommandError(error)
+        for model, total in totals.items():
+            self.stdout.write(f'{model}: {total}')
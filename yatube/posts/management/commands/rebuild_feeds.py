@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import feed
+from posts.models import Follow
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок по текущим подпискам'
+
+    def handle(self, *args, **options):
+        user_ids = Follow.objects.values_list(
+            'user_id', flat=True
+        ).distinct().order_by('user_id')
+        total = 0
+        for user_id in user_ids.iterator():
+            feed.rebuild(user_id)
+            total += 1
+        self.stdout.write(f'Пересобрано лент: {total}')
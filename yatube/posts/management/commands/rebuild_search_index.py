@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Переиндексирует все посты для полнотекстового поиска'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('Поиск FTS5 доступен только на SQLite')
+        if not search.install():
+            search.rebuild()
+        self.stdout.write('Поисковый индекс пересобран')
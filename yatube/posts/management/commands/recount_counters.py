@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает хранимые счётчики постов, комментариев и подписок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько объектов пересчитывать за один запрос',
+        )
+
+    def handle(self, *args, **options):
+        totals = counters.recount_all(batch_size=options['batch_size'])
+        for name, total in totals.items():
+            self.stdout.write(f'{name}: {total}')
@@ -0,0 +1,73 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from sorl.thumbnail import delete as delete_thumbnails
+
+from posts import images, thumbnails
+from posts.models import Post
+
+
+def reprocess(post_id):
+    """Обрабатывает картинку поста; возвращает сэкономленные байты.
+
+    None - картинку не удалось прочитать, 0 - обработка не нужна.
+    """
+    try:
+        post = Post.objects.filter(pk=post_id).first()
+        if post is None or not post.image:
+            return 0
+        storage = post.image.storage
+        name = post.image.name
+        with storage.open(name) as source:
+            processed = images.ingest(source)
+            if processed is None:
+                return 0
+            source.seek(0, 2)
+            saved = source.tell() - processed.size
+        # Старый файл удаляется только после того, как пост ссылается
+        # на новый: при сбое посередине картинка не пропадает.
+        new_name = storage.save(name, processed)
+        if not Post.objects.filter(pk=post_id, image=name).update(
+                image=new_name):
+            # Картинку заменили, пока шла обработка
+            storage.delete(new_name)
+            return 0
+        delete_thumbnails(post.image, delete_file=False)
+        storage.delete(name)
+        thumbnails.generate(post_id)
+        return saved
+    except Exception:
+        images.logger.exception(
+            'Не удалось обработать картинку поста %s', post_id)
+        return None
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = ('Уменьшает и пересжимает уже загруженные картинки постов '
+            'без EXIF')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько потоков обрабатывают картинки параллельно',
+        )
+
+    def handle(self, *args, **options):
+        post_ids = Post.objects.exclude(image='').order_by(
+            'pk').values_list('pk', flat=True)
+        done = skipped = failed = saved = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for result in pool.map(reprocess, post_ids.iterator()):
+                if result is None:
+                    failed += 1
+                elif result:
+                    done += 1
+                    saved += result
+                else:
+                    skipped += 1
+        self.stdout.write(
+            f'Обработано: {done}, без изменений: {skipped}, '
+            f'ошибок: {failed}, освобождено: {saved // 1024} КиБ')
@@ -0,0 +1,19 @@
+# Generated by Django 2.2.16 on 2026-10-16 22:27
+
+from django.db import migrations, models
+import posts.images
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_post_updated_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, storage=posts.images.IngestingStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+    ]
@@ -1,11 +1,21 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth import get_user_model
 
+from .images import IngestingStorage
+
 User = get_user_model()
 
 POST_TEXT_SHOWS = 15
 
 
+class AtomicSaveMixin:
+    """save() и обработчики post_save выполняются в одной транзакции."""
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
 class Group(models.Model):
     title = models.CharField(max_length=200, verbose_name='Название группы')
     slug = models.SlugField(max_length=200,
@@ -14,17 +24,20 @@ class Group(models.Model):
                             verbose_name='Уникальное название группы')
     description = models.TextField(max_length=400,
                                    verbose_name='Описание группы')
+    posts_count = models.PositiveIntegerField(
+        'Число постов', default=0, editable=False)
 
     def __str__(self):
         return f'{self.title}'
 
 
-class Post(models.Model):
+class Post(AtomicSaveMixin, models.Model):
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
     )
     pub_date = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField('Изменён', auto_now=True)
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -43,19 +56,38 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=IngestingStorage(),
         blank=True
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев', default=0, editable=False)
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты идут по (-pub_date, -id). SQLite дописывает к индексу id
+        # по возрастанию, поэтому индексы возрастающие и читаются с конца.
+        indexes = [
+            models.Index(fields=['pub_date'], name='post_pub_date_idx'),
+            models.Index(fields=['group', 'pub_date'],
+                         name='post_group_pub_date_idx'),
+            models.Index(fields=['author', 'pub_date'],
+                         name='post_author_pub_date_idx'),
+            # Метка свежести страниц автора и группы для ETag
+            # и элемент updated лент Atom.
+            models.Index(fields=['updated'], name='post_updated_idx'),
+            models.Index(fields=['author', 'updated'],
+                         name='post_author_updated_idx'),
+            models.Index(fields=['group', 'updated'],
+                         name='post_group_updated_idx'),
+        ]
 
     def __str__(self):
         return self.text[:POST_TEXT_SHOWS]
 
 
-class Comment(models.Model):
+class Comment(AtomicSaveMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -74,11 +106,17 @@ class Comment(models.Model):
     )
     created = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
     def __str__(self):
         return f'{self.text}'
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveMixin, models.Model):
     user = models.ForeignKey(
         User,
         related_name='follower',
@@ -91,9 +129,53 @@ class Follow(models.Model):
     )
 
     class Meta:
-        models.constraints = [
+        constraints = [
             models.UniqueConstraint(
                 fields=['user', 'author'],
                 name='author__following__user'
             )
         ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, обновляемые при записи."""
+    user = models.OneToOneField(
+        User,
+        related_name='stats',
+        on_delete=models.CASCADE
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+    def __str__(self):
+        return f'{self.user}'
+
+
+class FeedEntry(models.Model):
+    """Запись в ленте подписок: пост автора, на которого подписан user."""
+    user = models.ForeignKey(
+        User,
+        related_name='feed_entries',
+        on_delete=models.CASCADE
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='feed_entries',
+        on_delete=models.CASCADE
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date',)
+        indexes = [
+            models.Index(fields=['user', 'pub_date', 'post'],
+                         name='feed_user_pub_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='feed_entry_unique'
+            )
+        ]
@@ -0,0 +1,145 @@
+import base64
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values, direction=FORWARD):
+    payload = [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in values
+    ]
+    raw = json.dumps([direction, payload], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        direction, payload = json.loads(raw.decode())
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if direction not in (FORWARD, BACKWARD) or not isinstance(payload, list):
+        raise InvalidCursor(cursor)
+    values = []
+    for value in payload:
+        # Только скаляры: null, списки и словари в ключе не бывают.
+        if value is None or isinstance(value, (bool, list, dict)):
+            raise InvalidCursor(cursor)
+        if isinstance(value, str):
+            try:
+                value = parse_datetime(value) or value
+            except ValueError:
+                raise InvalidCursor(cursor)
+        values.append(value)
+    return values, direction
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу сортировки без COUNT и OFFSET.
+
+    Ключом служат поля order_by запроса, например ('-pub_date', '-pk'):
+    все в одном направлении, последнее уникально. Страница выбирается
+    условием на ключ, поэтому глубокие страницы стоят столько же,
+    сколько первая.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.next_cursor = None
+        self.previous_cursor = None
+
+    @cached_property
+    def keys(self):
+        ordering = (self.object_list.query.order_by
+                    or self.object_list.model._meta.ordering)
+        keys = [(name.lstrip('-'), name.startswith('-'))
+                for name in ordering]
+        if len({desc for _, desc in keys}) != 1:
+            raise ValueError('Поля курсора должны сортироваться одинаково')
+        return keys
+
+    @cached_property
+    def key_fields(self):
+        """Поля ключа: ими значения из курсора приводятся к типам."""
+        query = self.object_list.query
+        opts = self.object_list.model._meta
+        fields = []
+        for name, _ in self.keys:
+            if name == 'pk':
+                fields.append(opts.pk)
+            elif name in query.annotations:
+                fields.append(query.annotations[name].output_field)
+            else:
+                fields.append(opts.get_field(name))
+        return fields
+
+    def _key_values(self, obj):
+        return [getattr(obj, name) for name, _ in self.keys]
+
+    def _after(self, values, forward):
+        """Условие «строго после values» в направлении обхода."""
+        lookups = []
+        for name, desc in self.keys:
+            lookups.append((name, 'lt' if desc == forward else 'gt'))
+        condition = Q()
+        for i, (name, op) in enumerate(lookups):
+            exact = {name: value for (name, _), value
+                     in zip(lookups[:i], values[:i])}
+            condition |= Q(**{f'{name}__{op}': values[i]}, **exact)
+        # Нестрогая граница по первому полю даёт индексу диапазон поиска.
+        first, op = lookups[0]
+        return Q(**{f'{first}__{op}e': values[0]}) & condition
+
+    def get_page(self, cursor=None):
+        values, direction = None, FORWARD
+        if cursor:
+            try:
+                values, direction = decode_cursor(cursor)
+                if len(values) != len(self.keys):
+                    raise InvalidCursor(cursor)
+                values = [field.to_python(value) for field, value
+                          in zip(self.key_fields, values)]
+            except (InvalidCursor, ValidationError, TypeError, ValueError):
+                # Подделанный или устаревший курсор - первая страница.
+                values, direction = None, FORWARD
+        return self.page_at(values, direction)
+
+    def fetch(self, values, forward, limit):
+        """Первые limit объектов после ключа values в направлении обхода."""
+        queryset = self.object_list
+        if not forward:
+            queryset = queryset.reverse()
+        if values is not None:
+            queryset = queryset.filter(self._after(values, forward))
+        return list(queryset[:limit])
+
+    def page_at(self, values, direction=FORWARD):
+        forward = direction == FORWARD
+        items = self.fetch(values, forward, self.per_page + 1)
+        has_more = len(items) > self.per_page
+        items = items[:self.per_page]
+        if not forward:
+            items.reverse()
+        has_next = has_more if forward else values is not None
+        has_previous = values is not None if forward else has_more
+        if items and has_next:
+            self.next_cursor = encode_cursor(
+                self._key_values(items[-1]), FORWARD)
+        if items and has_previous:
+            self.previous_cursor = encode_cursor(
+                self._key_values(items[0]), BACKWARD)
+        return Page(items, 1, self)
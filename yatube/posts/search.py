@@ -0,0 +1,143 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Таблица posts_post_fts хранит индекс по Post.text (external content),
+а триггеры на posts_post держат её в актуальном состоянии. Результаты
+упорядочены по bm25 и листаются курсором по ключу (score, pk).
+"""
+import re
+
+from django.db import connection, models
+
+from .models import Post
+from .paginators import CursorPaginator
+
+FTS_TABLE = 'posts_post_fts'
+
+INSTALL_SQL = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text,
+        content='posts_post',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai
+    AFTER INSERT ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad
+    AFTER DELETE ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF text ON posts_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text)
+        VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END""",
+]
+TRIGGERS = [f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au']
+
+WORD_RE = re.compile(r'\w+')
+
+
+def is_available():
+    return connection.vendor == 'sqlite'
+
+
+def is_installed():
+    """Есть ли таблица индекса и все триггеры."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+            [FTS_TABLE, *TRIGGERS],
+        )
+        return len(cursor.fetchall()) == len(TRIGGERS) + 1
+
+
+def install():
+    """Создаёт таблицу и триггеры, если их нет; True - если создавал.
+
+    Пересоздание таблицы posts_post в миграциях SQLite удаляет
+    триггеры, поэтому install() вызывается и после каждой миграции.
+    """
+    if not is_available() or is_installed():
+        return False
+    with connection.cursor() as cursor:
+        for sql in INSTALL_SQL:
+            cursor.execute(sql)
+    rebuild()
+    return True
+
+
+def rebuild():
+    """Переиндексирует все посты одним проходом FTS5."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def match_expression(query):
+    """Запрос пользователя как выражение MATCH: все слова, последнее -
+    как префикс. Операторы FTS5 из ввода не интерпретируются."""
+    words = WORD_RE.findall(query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def matching_ids_sql(expression):
+    """Подзапрос id постов для pk__in=RawSQL(...)."""
+    return (f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+            [expression])
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсор по (score, pk), где score - bm25 (меньше - лучше)."""
+    keys = [('score', False), ('pk', False)]
+    key_fields = [models.FloatField(), models.IntegerField()]
+
+    def __init__(self, expression, per_page, group_id=None, author_id=None):
+        super().__init__(Post.objects.none(), per_page)
+        self.expression = expression
+        self.group_id = group_id
+        self.author_id = author_id
+
+    def fetch(self, values, forward, limit):
+        where = [f'{FTS_TABLE} MATCH %s']
+        params = [self.expression]
+        if self.group_id is not None:
+            where.append('p.group_id = %s')
+            params.append(self.group_id)
+        if self.author_id is not None:
+            where.append('p.author_id = %s')
+            params.append(self.author_id)
+        score = f'bm25({FTS_TABLE})'
+        op = '>' if forward else '<'
+        if values is not None:
+            where.append(
+                f'({score} {op} %s OR ({score} = %s AND p.id {op} %s))')
+            params += [values[0], values[0], values[1]]
+        order = 'ASC' if forward else 'DESC'
+        sql = (
+            f'SELECT p.id, {score} FROM {FTS_TABLE} '
+            f'JOIN posts_post p ON p.id = {FTS_TABLE}.rowid '
+            f'WHERE {" AND ".join(where)} '
+            f'ORDER BY {score} {order}, p.id {order} LIMIT %s'
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params + [limit])
+            rows = cursor.fetchall()
+        posts = Post.objects.select_related(
+            'author', 'group').in_bulk([pk for pk, _ in rows])
+        items = []
+        for pk, score_value in rows:
+            post = posts.get(pk)
+            if post is not None:
+                post.score = score_value
+                items.append(post)
+        return items
@@ -0,0 +1,114 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache, counters, feed, follow_graph
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _post_scopes(post, *group_ids):
+    slugs = Group.objects.filter(
+        pk__in={pk for pk in group_ids if pk is not None}
+    ).values_list('slug', flat=True)
+    return ['posts', f'author:{post.author.username}',
+            *(f'group:{slug}' for slug in slugs)]
+
+
+def _display_name(user):
+    return user.username, user.first_name, user.last_name
+
+
+@receiver(post_init, sender=User)
+def remember_display_name(sender, instance, **kwargs):
+    instance._saved_display_name = _display_name(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        UserStats.objects.get_or_create(user=instance)
+    elif instance._saved_display_name != _display_name(instance):
+        # Имя автора есть в карточках его постов.
+        instance.posts.update(updated=timezone.now())
+        cache.bump_on_commit(
+            'posts', f'author:{instance._saved_display_name[0]}',
+            f'author:{instance.username}')
+    instance._saved_display_name = _display_name(instance)
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    instance._saved_group_id = instance.group_id
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.post_added(instance.author_id, instance.group_id)
+        feed.fan_out_post(instance)
+    else:
+        counters.post_moved(instance._saved_group_id, instance.group_id)
+    cache.bump_on_commit(*_post_scopes(
+        instance, instance._saved_group_id, instance.group_id))
+    instance._saved_group_id = instance.group_id
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.post_removed(instance.author_id, instance._saved_group_id)
+    cache.bump_on_commit(*_post_scopes(instance, instance._saved_group_id))
+
+
+@receiver(post_init, sender=Group)
+def remember_slug(sender, instance, **kwargs):
+    instance._saved_slug = instance.slug
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        instance.posts.update(updated=timezone.now())
+    # После смены slug устаревают страницы и старого, и нового адреса.
+    cache.bump_on_commit('posts', f'group:{instance._saved_slug}',
+                         f'group:{instance.slug}')
+    instance._saved_slug = instance.slug
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    cache.bump_on_commit('posts', f'group:{instance.slug}')
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.comment_added(instance.post_id)
+        cache.bump_on_commit('posts')
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.comment_added(instance.post_id, -1)
+    cache.bump_on_commit('posts')
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.follow_added(instance.user_id, instance.author_id)
+        follow_graph.forget_on_commit(instance.user_id)
+        feed.backfill(instance.user_id, instance.author_id)
+        cache.bump_on_commit(f'author:{instance.author.username}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.follow_added(instance.user_id, instance.author_id, -1)
+    follow_graph.forget_on_commit(instance.user_id)
+    feed.trim(instance.user_id, instance.author_id)
+    feed.restore_push(instance.author_id)
+    cache.bump_on_commit(f'author:{instance.author.username}')
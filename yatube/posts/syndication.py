@@ -0,0 +1,246 @@
+"""Потоковые ленты RSS 2.0, Atom и JSON Feed.
+
+Документ отдаётся через StreamingHttpResponse и собирается по мере
+чтения постов итератором queryset пачками по ITERATOR_CHUNK_SIZE,
+поэтому память не растёт с числом записей в ленте. Ленты одинаковы
+для всех читателей: ETag строится по версии области кэша страниц,
+поэтому лента читается из основной базы, а не из отставшей реплики.
+Last-Modified не отдаётся: самый поздний Post.updated не меняется при
+удалении поста, и клиент с одним If-Modified-Since получил бы 304.
+"""
+import hashlib
+import json
+from datetime import datetime, timezone
+from functools import wraps
+from io import StringIO
+
+from django.http import Http404, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.feedgenerator import rfc2822_date, rfc3339_date
+from django.utils.xmlutils import SimplerXMLGenerator
+from django.views.decorators.http import condition
+
+from core import db_routing
+
+from . import cache
+
+FEED_ITEMS = 50
+FEED_MAX_ITEMS = 10000
+ITERATOR_CHUNK_SIZE = 200
+FLUSH_EVERY = 20
+JSON_FEED_VERSION = 'https://jsonfeed.org/version/1.1'
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+CONTENT_TYPES = {
+    'rss': 'application/rss+xml; charset=utf-8',
+    'atom': 'application/atom+xml; charset=utf-8',
+    'json': 'application/feed+json; charset=utf-8',
+}
+
+
+class FeedMeta:
+    """Заголовок ленты и её записи."""
+
+    def __init__(self, request, title, link, posts, description=''):
+        self.request = request
+        self.title = title
+        self.link = request.build_absolute_uri(link)
+        self.feed_url = request.build_absolute_uri()
+        self.description = description or title
+        self.posts = posts
+        self.limit = item_limit(request)
+
+    def items(self):
+        posts = self.posts.select_related('author', 'group').order_by(
+            '-pub_date', '-pk')[:self.limit]
+        return posts.iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+
+    def post_link(self, post):
+        return self.request.build_absolute_uri(
+            reverse('posts:post_detail', args=[post.pk]))
+
+
+def item_limit(request):
+    try:
+        limit = int(request.GET.get('limit', FEED_ITEMS))
+    except ValueError:
+        limit = FEED_ITEMS
+    return max(1, min(limit, FEED_MAX_ITEMS))
+
+
+def author_name(user):
+    return user.get_full_name() or user.username
+
+
+def _flushing(writer, buffer, items, write_item):
+    """Пишет записи и отдаёт накопленный текст каждые FLUSH_EVERY."""
+    for number, post in enumerate(items, 1):
+        write_item(writer, post)
+        if number % FLUSH_EVERY == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _xml_feed(meta, start, write_item, end):
+    buffer = StringIO()
+    writer = SimplerXMLGenerator(buffer, 'utf-8')
+    writer.startDocument()
+    start(writer, meta)
+    yield from _flushing(writer, buffer, meta.items(), write_item)
+    buffer.seek(0)
+    buffer.truncate()
+    end(writer)
+    yield buffer.getvalue()
+
+
+def rss(meta):
+    def start(writer, meta):
+        writer.startElement('rss', {
+            'version': '2.0',
+            'xmlns:atom': 'http://www.w3.org/2005/Atom',
+            'xmlns:dc': 'http://purl.org/dc/elements/1.1/',
+        })
+        writer.startElement('channel', {})
+        writer.addQuickElement('title', meta.title)
+        writer.addQuickElement('link', meta.link)
+        writer.addQuickElement('description', meta.description)
+        writer.addQuickElement(
+            'atom:link', None, {'rel': 'self', 'href': meta.feed_url})
+
+    def write_item(writer, post):
+        link = meta.post_link(post)
+        writer.startElement('item', {})
+        writer.addQuickElement('title', str(post))
+        writer.addQuickElement('link', link)
+        writer.addQuickElement('description', post.text)
+        writer.addQuickElement('dc:creator', author_name(post.author))
+        writer.addQuickElement('pubDate', rfc2822_date(post.pub_date))
+        writer.addQuickElement('guid', link, {'isPermaLink': 'true'})
+        if post.group is not None:
+            writer.addQuickElement('category', post.group.title)
+        writer.endElement('item')
+
+    def end(writer):
+        writer.endElement('channel')
+        writer.endElement('rss')
+
+    return _xml_feed(meta, start, write_item, end)
+
+
+def atom(meta):
+    def start(writer, meta):
+        writer.startElement('feed', {'xmlns': 'http://www.w3.org/2005/Atom'})
+        writer.addQuickElement('title', meta.title)
+        writer.addQuickElement(
+            'link', None, {'rel': 'alternate', 'href': meta.link})
+        writer.addQuickElement(
+            'link', None, {'rel': 'self', 'href': meta.feed_url})
+        writer.addQuickElement('id', meta.feed_url)
+        writer.addQuickElement('subtitle', meta.description)
+        writer.addQuickElement('updated', rfc3339_date(
+            last_modified(meta.posts) or EPOCH))
+
+    def write_item(writer, post):
+        link = meta.post_link(post)
+        writer.startElement('entry', {})
+        writer.addQuickElement('title', str(post))
+        writer.addQuickElement(
+            'link', None, {'rel': 'alternate', 'href': link})
+        writer.addQuickElement('id', link)
+        writer.addQuickElement('published', rfc3339_date(post.pub_date))
+        writer.addQuickElement('updated', rfc3339_date(post.updated))
+        writer.startElement('author', {})
+        writer.addQuickElement('name', author_name(post.author))
+        writer.endElement('author')
+        writer.addQuickElement('content', post.text, {'type': 'text'})
+        if post.group is not None:
+            writer.addQuickElement(
+                'category', None, {'term': post.group.title})
+        writer.endElement('entry')
+
+    def end(writer):
+        writer.endElement('feed')
+
+    return _xml_feed(meta, start, write_item, end)
+
+
+def json_feed(meta):
+    header = json.dumps({
+        'version': JSON_FEED_VERSION,
+        'title': meta.title,
+        'home_page_url': meta.link,
+        'feed_url': meta.feed_url,
+        'description': meta.description,
+    }, ensure_ascii=False)
+    yield header[:-1] + ', "items": ['
+    chunk = []
+    for number, post in enumerate(meta.items()):
+        item = {
+            'id': str(post.pk),
+            'url': meta.post_link(post),
+            'title': str(post),
+            'content_text': post.text,
+            'date_published': rfc3339_date(post.pub_date),
+            'date_modified': rfc3339_date(post.updated),
+            'authors': [{'name': author_name(post.author)}],
+        }
+        if post.group is not None:
+            item['tags'] = [post.group.title]
+        if post.image:
+            item['image'] = meta.request.build_absolute_uri(post.image.url)
+        chunk.append(('' if number == 0 else ', ')
+                     + json.dumps(item, ensure_ascii=False))
+        if len(chunk) == FLUSH_EVERY:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk) + ']}'
+
+
+WRITERS = {'rss': rss, 'atom': atom, 'json': json_feed}
+
+
+def response(kind, meta):
+    if kind not in WRITERS:
+        raise Http404('Неизвестный формат ленты')
+    return StreamingHttpResponse(
+        WRITERS[kind](meta), content_type=CONTENT_TYPES[kind])
+
+
+def last_modified(posts):
+    """Самое позднее изменение среди постов ленты."""
+    return posts.order_by('-updated').values_list(
+        'updated', flat=True).first()
+
+
+def feed_condition(scope, exists=None):
+    """Условный GET для ленты.
+
+    scope(**kwargs) и exists(**kwargs) получают аргументы URL без kind
+    и возвращают область кэша страниц и признак, что автор или группа
+    ленты существуют. Версия области меняется и при удалении поста,
+    которое не видно по Post.updated, поэтому ETag строится по ней.
+    Версия несуществующей области не создаётся: get_versions хранит
+    версии бессрочно, и запросы к случайным адресам засоряли бы кэш.
+    """
+    def etag_func(request, kind, **kwargs):
+        if kind not in WRITERS:
+            return None
+        if exists is not None and not exists(**kwargs):
+            raise Http404('Лента не найдена')
+        version, = cache.get_versions([scope(**kwargs)])
+        raw = repr((kind, item_limit(request), version))
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def decorator(view):
+        view = condition(etag_func=etag_func)(view)
+
+        # Тело ленты читается уже после ReplicaMiddleware, когда чтения
+        # и так идут в default; здесь - проверка exists и сама view.
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with db_routing.use_primary():
+                return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,34 @@
+from django import template
+from django.core.cache import cache
+from django.template.loader import render_to_string
+
+register = template.Library()
+
+POST_CARD_TEMPLATE = 'posts/includes/post_list.html'
+POST_CARD_TIMEOUT = 60 * 60 * 24
+POST_CARD_KEY = 'post_card:{}:{}'
+
+
+def card_key(post):
+    return POST_CARD_KEY.format(post.pk, post.updated.timestamp())
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Пары (post, html карточки) для страницы постов.
+
+    Карточки берутся из кэша одним get_many по ключу из id и времени
+    изменения поста; недостающие рендерятся и сохраняются set_many.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            missing[key] = render_to_string(
+                POST_CARD_TEMPLATE, {'post': post})
+    if missing:
+        cache.set_many(missing, POST_CARD_TIMEOUT)
+        cards.update(missing)
+    return [(post, cards[key]) for post, key in zip(posts, keys)]
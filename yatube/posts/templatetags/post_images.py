@@ -0,0 +1,19 @@
+from django import template
+
+from ..thumbnails import cached_thumbnail
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_image_url(image):
+    """URL готовой миниатюры, а пока её нет - URL оригинала."""
+    if not image:
+        return ''
+    try:
+        thumbnail = cached_thumbnail(image)
+    except Exception:
+        thumbnail = None
+    if thumbnail is not None:
+        return thumbnail.url
+    return image.url
@@ -0,0 +1,68 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from ..models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='writer')
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_new_post_fans_out_to_followers(self):
+        """Новый пост попадает в ленту подписчика"""
+        Follow.objects.create(user=self.user, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.user, post=post).exists()
+        )
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка дополняет ленту, отписка очищает её"""
+        post = Post.objects.create(author=self.author, text='Старый пост')
+        self.authorized_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        response = self.authorized_client.get(reverse('posts:follow_index'))
+        self.assertIn(post, response.context['page_obj'])
+        self.authorized_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(FeedEntry.objects.filter(user=self.user).exists())
+
+    def test_pull_author_read_on_request(self):
+        """Посты популярного автора подмешиваются при чтении"""
+        Follow.objects.create(user=self.user, author=self.author)
+        with mock.patch('posts.feed.FEED_FANOUT_MAX_FOLLOWERS', 0):
+            post = Post.objects.create(author=self.author, text='Пост')
+            self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+            response = self.authorized_client.get(
+                reverse('posts:follow_index')
+            )
+        self.assertIn(post, response.context['page_obj'])
+
+    def test_posts_return_to_feeds_when_author_leaves_pull(self):
+        """После перехода автора обратно к раздаче его посты в лентах"""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.user, author=self.author)
+        Follow.objects.create(user=other, author=self.author)
+        with mock.patch('posts.feed.FEED_FANOUT_MAX_FOLLOWERS', 1):
+            post = Post.objects.create(author=self.author, text='Пост')
+            self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+            Follow.objects.filter(user=other).delete()
+        self.assertEqual(
+            list(FeedEntry.objects.values_list('user_id', 'post_id')),
+            [(self.user.pk, post.pk)])
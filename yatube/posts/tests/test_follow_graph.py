@@ -0,0 +1,88 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, Client
+from django.urls import reverse
+
+from core.testing import run_on_commit
+
+from .. import follow_graph
+from ..models import Follow
+
+User = get_user_model()
+
+
+class FollowGraphTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='reader')
+        cls.authors = [User.objects.create_user(username=f'writer{number}')
+                       for number in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.user)
+
+    def test_ids_sorted_and_cached(self):
+        """Подписки читаются одним запросом и дальше берутся из кэша"""
+        for author in reversed(self.authors):
+            Follow.objects.create(user=self.user, author=author)
+        with self.assertNumQueries(1):
+            ids = follow_graph.following_ids(self.user.pk)
+        self.assertEqual(list(ids), sorted(a.pk for a in self.authors))
+        with self.assertNumQueries(0):
+            self.assertTrue(follow_graph.is_following(
+                self.user.pk, self.authors[1].pk))
+            self.assertFalse(follow_graph.is_following(
+                self.user.pk, self.user.pk))
+
+    def test_follow_and_unfollow_reset_after_commit(self):
+        """Подписка и отписка сбрасывают массив после коммита"""
+        author = self.authors[1]
+        follow_graph.following_ids(self.user.pk)
+        with run_on_commit():
+            self.authorized_client.get(
+                reverse('posts:profile_follow', args=[author.username]))
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(follow_graph.following_ids(self.user.pk)), [author.pk])
+        with run_on_commit():
+            self.authorized_client.get(
+                reverse('posts:profile_unfollow', args=[author.username]))
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                list(follow_graph.following_ids(self.user.pk)), [])
+
+    def test_rolled_back_follow_keeps_cache(self):
+        """Откат подписки не трогает закэшированный массив"""
+        follow_graph.following_ids(self.user.pk)
+        with run_on_commit():
+            try:
+                with transaction.atomic():
+                    Follow.objects.create(
+                        user=self.user, author=self.authors[0])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                list(follow_graph.following_ids(self.user.pk)), [])
+
+    def test_cascade_delete_removes_author(self):
+        """Удаление автора убирает его из подписок"""
+        author = User.objects.create_user(username='leaving')
+        Follow.objects.create(user=self.user, author=author)
+        follow_graph.following_ids(self.user.pk)
+        with run_on_commit():
+            author.delete()
+        self.assertNotIn(author.pk, follow_graph.following_ids(self.user.pk))
+
+    def test_profile_reads_following_from_cache(self):
+        """Страница автора берёт подписку из кэша"""
+        author = self.authors[0]
+        Follow.objects.create(user=self.user, author=author)
+        response = self.authorized_client.get(
+            reverse('posts:profile', args=[author.username]))
+        self.assertTrue(response.context['following'])
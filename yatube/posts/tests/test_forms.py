@@ -1,5 +1,8 @@
 import shutil
 import tempfile
+from io import BytesIO
+from types import SimpleNamespace
+from unittest import mock
 
 from django.conf import settings
 from django.test import Client, TestCase, override_settings
@@ -7,12 +10,24 @@ from django.core.files.uploadedfile import SimpleUploadedFile
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.db import transaction
+from PIL import Image
 
+from .. import thumbnails
 from ..models import Post, Group, Comment
+from ..thumbnails import cached_thumbnail
 
 User = get_user_model()
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -129,6 +144,48 @@ class PostCreateFormTests(TestCase):
             'posts:post_detail', args=[new_post.pk]))
         self.assertEqual(new_post, response.context['post'])
 
+    @override_settings(POST_THUMBNAIL_WORKERS=0)
+    def test_thumbnail_created_on_upload(self):
+        """Миниатюра создаётся при сохранении поста с картинкой"""
+        uploaded = SimpleUploadedFile(
+            name='thumb.gif',
+            content=SMALL_GIF,
+            content_type='image/gif'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Пост с картинкой', 'image': uploaded},
+        )
+        new_post = Post.objects.latest('id')
+        thumbnail = cached_thumbnail(new_post.image)
+        self.assertIsNotNone(thumbnail)
+        response = self.authorized_client.get(
+            reverse('posts:post_detail', args=[new_post.pk]))
+        self.assertContains(response, thumbnail.url)
+
+    @override_settings(POST_IMAGE_MAX_SIZE=(40, 40), POST_THUMBNAIL_WORKERS=0)
+    def test_image_ingested_on_upload(self):
+        """Картинка уменьшается, поворачивается по EXIF и теряет EXIF"""
+        photo = Image.new('RGB', (120, 60), 'red')
+        exif = Image.Exif()
+        exif[0x0112] = 6  # Orientation: повернуть на 90° по часовой
+        exif[0x010F] = 'Камера'
+        buffer = BytesIO()
+        photo.save(buffer, 'JPEG', exif=exif.tobytes())
+        uploaded = SimpleUploadedFile(
+            name='photo.jpg',
+            content=buffer.getvalue(),
+            content_type='image/jpeg'
+        )
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={'text': 'Фото', 'image': uploaded},
+        )
+        new_post = Post.objects.latest('id')
+        with Image.open(new_post.image.path) as stored:
+            self.assertEqual(stored.size, (20, 40))
+            self.assertNotIn('exif', stored.info)
+
     def test_comment_shows_on_post(self):
         """При отпраке комментария он создается под постом"""
         comments_count = Comment.objects.count()
@@ -145,3 +202,14 @@ class PostCreateFormTests(TestCase):
             'posts:post_detail', args=[self.post.pk]))
         self.assertEqual(Comment.objects.count(), comments_count + 1)
         self.assertEqual(new_comment.text, form_data['text'])
+
+
+class ThumbnailScheduleTests(TestCase):
+    def test_rolled_back_post_not_left_pending(self):
+        """Откат транзакции не оставляет пост в очереди миниатюр"""
+        post = SimpleNamespace(pk=10 ** 6, image='posts/image.gif')
+        with mock.patch('posts.thumbnails._workers', return_value=2):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                thumbnails.schedule(post)
+                raise RuntimeError
+        self.assertNotIn(post.pk, thumbnails._pending)
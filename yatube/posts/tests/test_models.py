@@ -1,7 +1,13 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from django.urls import reverse
 
-from ..models import Group, Post, POST_TEXT_SHOWS
+from .. import counters
+from ..models import Comment, Follow, Group, Post, UserStats, POST_TEXT_SHOWS
 
 User = get_user_model()
 
@@ -27,3 +33,93 @@ class PostModelTest(TestCase):
         self.assertEqual(post.__str__(), post.text[:POST_TEXT_SHOWS])
         group = PostModelTest.group
         self.assertEqual(str(group), group.title)
+
+    def test_follow_is_unique(self):
+        """Нельзя подписаться на автора дважды."""
+        follower = User.objects.create_user(username='follower')
+        Follow.objects.create(user=follower, author=self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=follower, author=self.user)
+
+
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+
+    def assertCounters(self, posts, group_posts, followers):
+        stats = UserStats.objects.get(user=self.user)
+        self.group.refresh_from_db()
+        self.assertEqual(stats.posts_count, posts)
+        self.assertEqual(self.group.posts_count, group_posts)
+        self.assertEqual(stats.followers_count, followers)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count,
+            followers)
+
+    def test_counters_follow_writes(self):
+        """Счётчики меняются при создании и удалении объектов"""
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='Пост')
+        Comment.objects.create(post=post, author=self.reader, text='Да')
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertCounters(posts=1, group_posts=1, followers=1)
+        post.group = None
+        post.save()
+        self.assertCounters(posts=1, group_posts=0, followers=1)
+        post.delete()
+        follow.delete()
+        self.assertCounters(posts=0, group_posts=0, followers=0)
+
+    def test_recount_fixes_drift(self):
+        """recount_counters восстанавливает сбившиеся счётчики"""
+        Post.objects.create(author=self.user, group=self.group, text='Пост')
+        Follow.objects.create(user=self.reader, author=self.user)
+        UserStats.objects.update(posts_count=10, followers_count=10,
+                                 following_count=10)
+        Group.objects.update(posts_count=10)
+        call_command('recount_counters', batch_size=1, stdout=StringIO())
+        self.assertCounters(posts=1, group_posts=1, followers=1)
+
+    def test_recount_creates_missing_stats(self):
+        """recount_counters создаёт строки счётчиков пачками"""
+        users = [User.objects.create_user(username=f'user{i}')
+                 for i in range(3)]
+        Post.objects.create(author=users[0], text='Пост')
+        UserStats.objects.all().delete()
+        with self.assertNumQueries(3):
+            counters._create_missing_stats(batch_size=100)
+        self.assertEqual(UserStats.objects.count(), User.objects.count())
+        call_command('recount_counters', stdout=StringIO())
+        self.assertEqual(
+            UserStats.objects.get(user=users[0]).posts_count, 1)
+
+    def test_counters_do_not_go_negative(self):
+        """Удаление при сбитом нулевом счётчике не роняет запрос"""
+        post = Post.objects.create(
+            author=self.user, group=self.group, text='Пост')
+        follow = Follow.objects.create(user=self.reader, author=self.user)
+        UserStats.objects.update(posts_count=0, followers_count=0,
+                                 following_count=0)
+        Group.objects.update(posts_count=0)
+        post.delete()
+        follow.delete()
+        self.assertCounters(posts=0, group_posts=0, followers=0)
+
+    def test_profile_without_stats_row_does_not_write(self):
+        """Профиль без строки счётчиков считает их, но не создаёт"""
+        Post.objects.create(author=self.user, text='Пост')
+        UserStats.objects.filter(user=self.user).delete()
+        response = self.client.get(
+            reverse('posts:profile', args=[self.user.username]))
+        self.assertEqual(response.context['author'].stats.posts_count, 1)
+        self.assertFalse(UserStats.objects.filter(user=self.user).exists())
@@ -0,0 +1,83 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from .. import transfer
+from ..models import Comment, FeedEntry, Follow, Group, Post
+
+User = get_user_model()
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.author = User.objects.create_user(username='writer')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Тестовый пост')
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def export(self):
+        stream = StringIO()
+        transfer.export_jsonl(stream)
+        stream.seek(0)
+        return stream
+
+    def test_round_trip(self):
+        """Выгрузка загружается в пустую базу с датами и связями"""
+        dump = self.export()
+        pub_date = self.post.pub_date
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        transfer.import_jsonl(dump)
+        post = Post.objects.select_related('author', 'group').get()
+        self.assertEqual(post.text, 'Тестовый пост')
+        self.assertEqual(post.author.username, 'writer')
+        self.assertEqual(post.group.slug, 'test-slug')
+        self.assertEqual(post.pub_date, pub_date)
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(post.comments.get().author.username, 'reader')
+        reader = User.objects.get(username='reader')
+        self.assertTrue(
+            FeedEntry.objects.filter(user=reader, post=post).exists())
+
+    def test_existing_users_and_groups_reused(self):
+        """Пользователи и группы с теми же именами не дублируются"""
+        transfer.import_jsonl(self.export())
+        self.assertEqual(User.objects.count(), 2)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Post.objects.filter(author=self.author).count(), 2)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_dates_kept_without_patching_fields(self):
+        """Даты auto_now берутся из выгрузки, поля моделей не меняются"""
+        past = timezone.now() - timedelta(days=30)
+        Post.objects.filter(pk=self.post.pk).update(pub_date=past,
+                                                    updated=past)
+        Comment.objects.update(created=past)
+        dump = self.export()
+        fields = [Post._meta.get_field('pub_date'),
+                  Post._meta.get_field('updated'),
+                  Comment._meta.get_field('created')]
+        flags = [(field.auto_now, field.auto_now_add) for field in fields]
+        with CaptureQueriesContext(connection) as queries:
+            transfer.import_jsonl(dump)
+        self.assertEqual(
+            [(field.auto_now, field.auto_now_add) for field in fields], flags)
+        post = Post.objects.latest('pk')
+        self.assertNotEqual(post.pk, self.post.pk)
+        self.assertEqual((post.pub_date, post.updated), (past, past))
+        self.assertEqual(post.comments.get().created, past)
+        self.assertTrue(any('WHERE 0' in query['sql']
+                            for query in queries.captured_queries))
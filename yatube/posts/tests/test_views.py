@@ -1,12 +1,17 @@
+import base64
+import json
 from http import HTTPStatus
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.test import TestCase, Client
 from django.urls import reverse
 from django.core.cache import cache
 
-from ..models import Group, Post, Follow
+from core.testing import QueryBudgetMixin, run_on_commit
+from ..cache import VERSION_KEY, get_versions
+from ..models import Comment, Group, Post, Follow
 from ..forms import PostForm
-from ..views import POSTS_SHOWN
+from ..views import COMMENTS_SHOWN, POSTS_SHOWN
 
 User = get_user_model()
 
@@ -63,6 +68,62 @@ class PaginatorViewsTest(TestCase):
                 self.assertEqual(len(response.context['page_obj']),
                                  Post.objects.count() - POSTS_SHOWN)
 
+    def test_cursor_pages(self):
+        """Курсоры ведут на следующую и предыдущую страницы"""
+        reverse_name_paginator = [
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': 'auth'}),
+        ]
+        for reverse_name in reverse_name_paginator:
+            with self.subTest(reverse_name=reverse_name):
+                cache.clear()
+                first = self.authorized_client.get(reverse_name)
+                paginator = first.context['page_obj'].paginator
+                self.assertIsNone(paginator.previous_cursor)
+                second = self.authorized_client.get(
+                    reverse_name, {'cursor': paginator.next_cursor})
+                page_obj = second.context['page_obj']
+                self.assertEqual(len(page_obj),
+                                 Post.objects.count() - POSTS_SHOWN)
+                self.assertIsNone(page_obj.paginator.next_cursor)
+                back = self.authorized_client.get(
+                    reverse_name,
+                    {'cursor': page_obj.paginator.previous_cursor})
+                self.assertEqual(list(back.context['page_obj']),
+                                 list(first.context['page_obj']))
+
+    def test_forged_cursor_shows_first_page(self):
+        """Курсор с чужими типами значений ведёт на первую страницу"""
+        payloads = [
+            ['n', ['abc', 1]], ['n', [{'a': 1}, 1]], ['n', [None, None]],
+            ['p', [1, 2]], ['n', ['2020-01-01T00:00:00', [1]]],
+            ['n', ['2020-13-45T00:00:00', 1]], ['n', [True, 1]],
+        ]
+        urls = [
+            (reverse('posts:index'), {}),
+            (reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+             {}),
+            (reverse('posts:profile', kwargs={'username': 'auth'}), {}),
+            (reverse('posts:search'), {'q': 'тестовый'}),
+        ]
+        for url, params in urls:
+            for payload in payloads:
+                cursor = base64.urlsafe_b64encode(
+                    json.dumps(payload).encode()).decode()
+                with self.subTest(url=url, payload=payload):
+                    cache.clear()
+                    response = self.authorized_client.get(
+                        url, {**params, 'cursor': cursor})
+                    self.assertEqual(response.status_code, HTTPStatus.OK)
+                    if params:
+                        # Ключ поиска (score, pk) - числа, и ['p', [1, 2]]
+                        # для него настоящий курсор.
+                        continue
+                    self.assertIsNone(
+                        response.context['page_obj'].paginator
+                        .previous_cursor)
+
 
 class TestPagesTests(TestCase):
     @classmethod
@@ -198,6 +259,56 @@ class TestPagesTests(TestCase):
         new_posts = response_new.content
         self.assertNotEqual(old_posts, new_posts)
 
+    def test_index_cache_invalidated_on_change(self):
+        """Главная кэшируется до изменения постов"""
+        self.authorized_client.get(reverse('posts:index'))
+        cached = self.authorized_client.get(reverse('posts:index'))
+        self.assertIsNone(cached.context)
+        with run_on_commit():
+            new_post = Post.objects.create(
+                text='test_new_post',
+                author=self.user,
+                group=self.group
+            )
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertIn(new_post, response.context['page_obj'])
+        with run_on_commit():
+            new_post.delete()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertNotIn(new_post, response.context['page_obj'])
+
+    def test_versions_bumped_after_commit_only(self):
+        """Версии страниц меняются после коммита, при откате - нет"""
+        scopes = ['posts', 'group:test-slug', 'group:renamed']
+        before = get_versions(scopes)
+        with self.assertRaises(IntegrityError):
+            with run_on_commit(), transaction.atomic():
+                Post.objects.create(author=self.user, text='Откат')
+                raise IntegrityError
+        self.assertEqual(get_versions(scopes), before)
+        with run_on_commit():
+            self.post.comments.create(author=self.user, text='Да').delete()
+        self.assertGreater(get_versions(scopes)[0], before[0])
+        self.group.slug = 'renamed'
+        with run_on_commit():
+            self.group.save()
+        after = get_versions(scopes)
+        self.assertGreater(after[1], before[1])
+        self.assertGreater(after[2], before[2])
+
+    def test_post_cards_follow_author_name(self):
+        """Карточки постов обновляются после смены имени автора"""
+        self.authorized_client.get(reverse('posts:index'))
+        self.user.first_name = 'Новое'
+        self.user.last_name = 'Имя'
+        with run_on_commit():
+            self.user.save()
+        for url in (reverse('posts:index'),
+                    reverse('posts:group_list', args=[self.group.slug])):
+            with self.subTest(url=url):
+                response = self.authorized_client.get(url)
+                self.assertContains(response, 'Новое Имя')
+
     def test_new_post_for_followers(self):
         """Проверка, что новая запись автора видна тем,
         кто на него подписан и НЕТ для тех, кто не подписан"""
@@ -238,3 +349,315 @@ class TestPagesTests(TestCase):
         """Проверка форм"""
         self.assertEqual(len(response.context['form'].fields), 3)
         self.assertIsInstance(response.context['form'], PostForm)
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        for number in range(POSTS_SHOWN + 3):
+            author = User.objects.create_user(username=f'author{number}')
+            Follow.objects.create(user=cls.reader, author=author)
+            Post.objects.create(
+                author=author,
+                group=cls.group,
+                text=f'Тестовый пост {number}',
+            )
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        for number in range(5):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'reader{number}'),
+                text='Комментарий',
+            )
+
+    def setUp(self):
+        self.authorized_client = Client()
+        self.authorized_client.force_login(self.reader)
+        cache.clear()
+
+    def test_views_within_query_budget(self):
+        """Число запросов не зависит от числа постов и комментариев"""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:post_comments', args=[self.post.pk]),
+        ]
+        for url in urls:
+            for client in (self.client, self.authorized_client):
+                with self.subTest(url=url):
+                    cache.clear()
+                    self.assertWithinQueryBudget(client, url)
+        self.assertWithinQueryBudget(
+            self.authorized_client, reverse('posts:follow_index'))
+
+
+class CommentPaginationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        for number in range(COMMENTS_SHOWN + 3):
+            Comment.objects.create(
+                post=cls.post, author=cls.user, text=f'Комментарий {number}')
+
+    def test_comments_load_in_batches(self):
+        """Пост показывает первую пачку, остальные - фрагментом"""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk]))
+        comments = response.context['comments']
+        self.assertEqual(len(comments), COMMENTS_SHOWN)
+        self.assertEqual(comments[0].text, 'Комментарий 0')
+        self.assertContains(response, 'data-comments-more')
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'cursor': comments.paginator.next_cursor})
+        self.assertTemplateUsed(response, 'includes/comment_list.html')
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            [f'Комментарий {number}' for number in
+             range(COMMENTS_SHOWN, COMMENTS_SHOWN + 3)])
+        self.assertNotContains(response, 'data-comments-more')
+
+    def test_forged_comment_cursor(self):
+        """Подделанный курсор комментариев не роняет страницу"""
+        cursor = base64.urlsafe_b64encode(
+            json.dumps(['n', ['abc', None]]).encode()).decode()
+        response = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'cursor': cursor})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['comments'][0].text,
+                         'Комментарий 0')
+
+
+class SearchViewTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.match = Post.objects.create(
+            author=cls.user, group=cls.group, text='Ёжики любят яблоки')
+        cls.other_match = Post.objects.create(
+            author=cls.other, text='Яблоки и груши')
+        Post.objects.create(author=cls.user, text='Про груши')
+
+    def test_search_ranks_and_filters(self):
+        """Поиск находит посты по словам и учитывает фильтры"""
+        response = self.client.get(reverse('posts:search'), {'q': 'яблок'})
+        self.assertEqual(set(response.context['page_obj']),
+                         {self.match, self.other_match})
+        response = self.client.get(
+            reverse('posts:search'),
+            {'q': 'яблоки', 'group': self.group.slug})
+        self.assertEqual(list(response.context['page_obj']), [self.match])
+        response = self.client.get(
+            reverse('posts:search'),
+            {'q': 'яблоки', 'author': self.other.username})
+        self.assertEqual(list(response.context['page_obj']),
+                         [self.other_match])
+
+    def test_search_follows_text_changes(self):
+        """Индекс обновляется при изменении и удалении поста"""
+        post = Post.objects.create(author=self.user, text='Ёжики')
+        post.text = 'Ёжики любят сливы'
+        post.save()
+        response = self.client.get(reverse('posts:search'), {'q': 'сливы'})
+        self.assertEqual(list(response.context['page_obj']), [post])
+        post.delete()
+        response = self.client.get(reverse('posts:search'), {'q': 'сливы'})
+        self.assertEqual(list(response.context['page_obj']), [])
+
+    def test_search_cursor(self):
+        """Результаты поиска листаются курсором"""
+        for number in range(POSTS_SHOWN + 2):
+            Post.objects.create(author=self.user, text=f'Сливы {number}')
+        response = self.client.get(reverse('posts:search'), {'q': 'сливы'})
+        paginator = response.context['page_obj'].paginator
+        self.assertContains(response, 'q=')
+        response = self.client.get(
+            reverse('posts:search'),
+            {'q': 'сливы', 'cursor': paginator.next_cursor})
+        self.assertEqual(len(response.context['page_obj']), 2)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        self.urls = [
+            reverse('posts:post_detail', args=[self.post.pk]),
+            reverse('posts:profile', args=[self.user.username]),
+            reverse('posts:group_list', args=[self.group.slug]),
+        ]
+
+    def get_etags(self, client):
+        return {url: client.get(url)['ETag'] for url in self.urls}
+
+    def assertNotModified(self, client, etags, expected):
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code == HTTPStatus.NOT_MODIFIED,
+                    expected)
+
+    def test_not_modified_until_change(self):
+        """Без изменений страницы отвечают 304, после правки - 200"""
+        etags = self.get_etags(self.client)
+        self.assertNotModified(self.client, etags, True)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        self.assertNotModified(self.client, etags, False)
+
+    def test_comment_changes_post_etag(self):
+        """Новый комментарий меняет ETag страницы поста"""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.reader, text='Да')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_viewer(self):
+        """ETag зависит от пользователя и его подписки"""
+        etags = self.get_etags(self.client)
+        self.assertNotModified(self.reader_client, etags, False)
+        url = reverse('posts:profile', args=[self.user.username])
+        etag = self.reader_client.get(url)['ETag']
+        Follow.objects.create(user=self.reader, author=self.user)
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_depends_on_csrf_cookie(self):
+        """Новый CSRF-секрет после входа меняет ETag страниц с формами"""
+        self.reader_client.cookies['csrftoken'] = 'a' * 64
+        etags = self.get_etags(self.reader_client)
+        self.assertNotModified(self.reader_client, etags, True)
+        self.reader_client.cookies['csrftoken'] = 'b' * 64
+        self.assertNotModified(self.reader_client, etags, False)
+
+    def test_etag_follows_viewer_not_follower_count(self):
+        """Подписка зрителя меняет ETag, даже если число подписчиков то же"""
+        other = User.objects.create_user(username='other')
+        with run_on_commit():
+            follow = Follow.objects.create(user=other, author=self.user)
+        url = reverse('posts:profile', args=[self.user.username])
+        etag = self.reader_client.get(url)['ETag']
+        with run_on_commit():
+            Follow.objects.create(user=self.reader, author=self.user)
+            follow.delete()
+        response = self.reader_client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.context['following'])
+
+
+class SyndicationTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.post = Post.objects.create(
+            author=cls.user, group=cls.group, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        self.urls = [
+            reverse('posts:index_feed', args=[kind])
+            for kind in ('rss', 'atom', 'json')
+        ] + [
+            reverse('posts:group_feed', args=[self.group.slug, 'atom']),
+            reverse('posts:profile_feed', args=[self.user.username, 'rss']),
+        ]
+
+    def test_unknown_feed_does_not_touch_cache(self):
+        """Лента несуществующего автора - 404 без версии в кэше"""
+        for url, scope in (
+            (reverse('posts:profile_feed', args=['nobody', 'rss']),
+             'author:nobody'),
+            (reverse('posts:group_feed', args=['nothing', 'atom']),
+             'group:nothing'),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+                self.assertIsNone(
+                    cache.get(VERSION_KEY.format(scope)))
+
+    def test_no_last_modified(self):
+        """Ленты отдают ETag без Last-Modified"""
+        response = self.client.get(self.urls[0])
+        self.assertTrue(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_feeds_stream_posts(self):
+        """Ленты отдаются потоком и содержат пост"""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertTrue(response.streaming)
+                content = b''.join(response.streaming_content).decode()
+                self.assertIn(self.post.text, content)
+
+    def test_json_feed_is_valid(self):
+        response = self.client.get(
+            reverse('posts:index_feed', args=['json']))
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(len(data['items']), 1)
+        self.assertEqual(data['items'][0]['id'], str(self.post.pk))
+
+    def test_unknown_feed_kind(self):
+        response = self.client.get(
+            reverse('posts:index_feed', args=['html']))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_not_modified_until_new_post(self):
+        """Ленты отвечают 304, пока не появится новый пост"""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_MODIFIED)
+        with run_on_commit():
+            Post.objects.create(
+                author=self.user, group=self.group, text='Новый пост')
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
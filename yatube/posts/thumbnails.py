@@ -0,0 +1,116 @@
+"""Миниатюры картинок постов, создаваемые заранее в фоне.
+
+sorl.thumbnail создаёт миниатюру при первом рендере шаблона, и первый
+зритель платит за декодирование и сжатие картинки. Здесь миниатюры
+создаются пулом потоков сразу после сохранения поста, а шаблоны
+показывают оригинал, пока миниатюры ещё нет.
+
+sorl импортируется внутри функций: модуль грузится с URLconf и
+тегами шаблонов, а движок с PIL нужен только при рендере картинки.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+POST_IMAGE_GEOMETRY = '960x339'
+POST_IMAGE_OPTIONS = {'crop': 'center', 'upscale': True}
+RENDITIONS = [(POST_IMAGE_GEOMETRY, POST_IMAGE_OPTIONS)]
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _workers():
+    # Базу SQLite в памяти (тесты) нельзя делить с фоновыми потоками.
+    if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+        return 0
+    return getattr(settings, 'POST_THUMBNAIL_WORKERS', 2)
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_workers(), thread_name_prefix='thumbnails')
+        return _executor
+
+
+def cached_thumbnail(file_, geometry=POST_IMAGE_GEOMETRY, **options):
+    """Готовая миниатюра из kvstore sorl или None; ничего не создаёт."""
+    from sorl.thumbnail import default
+    from sorl.thumbnail.conf import defaults as sorl_defaults
+    from sorl.thumbnail.conf import settings as sorl_settings
+    from sorl.thumbnail.images import ImageFile
+
+    options = {**POST_IMAGE_OPTIONS, **options}
+    backend = default.backend
+    source = ImageFile(file_)
+    # Те же опции по умолчанию, что в ThumbnailBackend.get_thumbnail,
+    # чтобы имя файла совпало с именем созданной миниатюры. _get_format,
+    # _get_thumbnail_filename и extra_options - внутренние API sorl,
+    # проверенные на закреплённой sorl-thumbnail==12.7.0: при обновлении
+    # sorl сверить с ThumbnailBackend.get_thumbnail.
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault('format', backend._get_format(source))
+    for key, value in backend.default_options.items():
+        options.setdefault(key, value)
+    for key, attr in backend.extra_options:
+        value = getattr(sorl_settings, attr)
+        if value != getattr(sorl_defaults, attr):
+            options.setdefault(key, value)
+    name = backend._get_thumbnail_filename(source, geometry, options)
+    return default.kvstore.get(ImageFile(name, default.storage))
+
+
+def generate(post_id, refresh=True):
+    """Создаёт все миниатюры поста; возвращает True при успехе."""
+    from sorl.thumbnail import get_thumbnail
+
+    from .models import Post
+
+    try:
+        post = Post.objects.filter(pk=post_id).first()
+        if post is None or not post.image:
+            return False
+        for geometry, options in RENDITIONS:
+            get_thumbnail(post.image, geometry, **options)
+        if refresh:
+            # Новое Post.updated сбрасывает кэш карточки и страниц.
+            post.save(update_fields=['updated'])
+        return True
+    except Exception:
+        logger.exception('Не удалось создать миниатюры поста %s', post_id)
+        return False
+    finally:
+        with _lock:
+            _pending.discard(post_id)
+        if threading.current_thread() is not threading.main_thread():
+            connection.close()
+
+
+def schedule(post):
+    """Ставит создание миниатюр поста в очередь после коммита."""
+    if not post.image:
+        return
+    if _workers() == 0:
+        generate(post.pk)
+        return
+    post_id = post.pk
+    # В _pending пост попадает только после коммита: при откате
+    # транзакции on_commit не сработает, и id не застрянет там навсегда.
+    transaction.on_commit(lambda: _submit(post_id))
+
+
+def _submit(post_id):
+    with _lock:
+        if post_id in _pending:
+            return
+        _pending.add(post_id)
+    _get_executor().submit(generate, post_id)
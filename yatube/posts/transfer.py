@@ -0,0 +1,283 @@
+"""Перенос пользователей, групп, постов, комментариев и подписок в JSONL.
+
+Каждая строка - один объект: {"model": "post", "id": 7, ...}. Ссылки
+(author, group, post, user) указывают на id исходной базы, поэтому
+экспорт пишет модели в порядке MODELS, а импорт ведёт словари
+исходный id -> новый pk. Импорт копит объекты пачками и пишет их
+через bulk_create, каждую пачку в своей транзакции, в обход сигналов;
+счётчики, ленты подписок и версии кэша страниц пересчитываются один
+раз в конце. bulk_create вызывает pre_save, и auto_now затирает даты
+текущим временем, поэтому даты из исходной базы записываются вторым
+проходом bulk_update в той же транзакции.
+"""
+import json
+
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import cache, counters, feed, follow_graph
+from .models import Comment, Follow, Group, Post, User
+
+BATCH_SIZE = 1000
+ITERATOR_CHUNK_SIZE = 2000
+MODELS = ('user', 'group', 'post', 'comment', 'follow')
+# Области кэша страниц для уже существовавших пользователей и групп.
+PAGE_SCOPES = {'user': 'author', 'group': 'group'}
+
+
+class TransferError(ValueError):
+    """Строка импорта не читается или ссылается на неизвестный объект."""
+
+
+def _date(value):
+    return value.isoformat() if value is not None else None
+
+
+def _rows(queryset, fields):
+    return queryset.order_by('pk').values_list(*fields).iterator(
+        chunk_size=ITERATOR_CHUNK_SIZE)
+
+
+def export_records(with_passwords=False):
+    """Генератор словарей всех объектов в порядке MODELS."""
+    user_fields = ['pk', 'username', 'first_name', 'last_name', 'email',
+                   'date_joined']
+    if with_passwords:
+        user_fields.append('password')
+    for row in _rows(User.objects.all(), user_fields):
+        record = dict(zip(['id', *user_fields[1:]], row))
+        record['date_joined'] = _date(record['date_joined'])
+        yield {'model': 'user', **record}
+    for pk, slug, title, description in _rows(
+            Group.objects.all(), ['pk', 'slug', 'title', 'description']):
+        yield {'model': 'group', 'id': pk, 'slug': slug, 'title': title,
+               'description': description}
+    for pk, author, group, text, image, pub_date, updated in _rows(
+            Post.objects.all(), ['pk', 'author_id', 'group_id', 'text',
+                                 'image', 'pub_date', 'updated']):
+        yield {'model': 'post', 'id': pk, 'author': author, 'group': group,
+               'text': text, 'image': image, 'pub_date': _date(pub_date),
+               'updated': _date(updated)}
+    for pk, post, author, text, created in _rows(
+            Comment.objects.all(),
+            ['pk', 'post_id', 'author_id', 'text', 'created']):
+        yield {'model': 'comment', 'id': pk, 'post': post, 'author': author,
+               'text': text, 'created': _date(created)}
+    for user, author in _rows(Follow.objects.all(), ['user_id', 'author_id']):
+        yield {'model': 'follow', 'user': user, 'author': author}
+
+
+def export_jsonl(stream, with_passwords=False):
+    """Пишет JSONL в stream; возвращает число объектов по моделям."""
+    totals = dict.fromkeys(MODELS, 0)
+    for record in export_records(with_passwords):
+        stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+        totals[record['model']] += 1
+    return totals
+
+
+def _lock(model):
+    """Запрещает чужие вставки в таблицу model до конца транзакции.
+
+    SQLite блокирует запись во всю базу на первом изменении, и UPDATE
+    без единой строки берёт блокировку сразу, даже после BEGIN DEFERRED.
+    """
+    connection = connections[router.db_for_write(model)]
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                f'UPDATE {table} SET {column} = {column} WHERE 0')
+        else:
+            cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+
+
+def _reset_sequence(model):
+    """Сдвигает последовательность pk за явно заданные значения."""
+    connection = connections[router.db_for_write(model)]
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+            cursor.execute(sql)
+
+
+class Importer:
+    """Импорт JSONL пачками с отображением исходных id на новые pk.
+
+    Пользователи и группы, уже существующие с тем же username или slug,
+    не создаются заново, а связываются с найденными. Новым объектам pk
+    назначается сразу после текущего максимума: SQLite не возвращает pk
+    из bulk_create, а без них не построить словари для ссылок. Чтобы
+    живая вставка не заняла тот же pk, таблица блокируется до конца
+    транзакции пачки.
+    """
+
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self.ids = {model: {} for model in MODELS}
+        self.pending = {model: [] for model in MODELS}
+        self.totals = dict.fromkeys(MODELS, 0)
+        self.scopes = {'posts'}
+        self.first_pks = {}
+
+    def add(self, record):
+        model = record.get('model')
+        if model not in self.pending:
+            raise TransferError(f'Неизвестная модель: {model!r}')
+        # Ссылки идут только на объекты, которые были раньше в потоке.
+        for other, pending in self.pending.items():
+            if other != model and pending:
+                self.flush(other)
+        self.pending[model].append(record)
+        if len(self.pending[model]) >= self.batch_size:
+            self.flush(model)
+
+    def finish(self):
+        for model in MODELS:
+            self.flush(model)
+        # Новые комментарии есть только у новых постов, и пересчитывать
+        # comments_count остальных незачем.
+        counters.recount_all(posts=Post.objects.filter(
+            pk__in=Comment.objects.filter(
+                pk__gte=self.first_pks.get('comment', 0)
+            ).values('post_id'),
+        ) if 'comment' in self.first_pks else Post.objects.none())
+        feed.rebuild_all()
+        cache.bump(*self.scopes)
+        return self.totals
+
+    def flush(self, model):
+        records, self.pending[model] = self.pending[model], []
+        if not records:
+            return
+        with transaction.atomic():
+            getattr(self, f'_import_{model}')(records)
+        self.totals[model] += len(records)
+
+    def _ref(self, model, source_id):
+        if source_id is None:
+            return None
+        try:
+            return self.ids[model][source_id]
+        except KeyError:
+            raise TransferError(
+                f'Ссылка на неизвестный объект {model} {source_id}')
+
+    def _create(self, model, source_model, records, build, dates=()):
+        """Создаёт объекты build(record) с pk подряд после максимума.
+
+        dates - поля auto_now, значения которых build берёт из записи.
+        """
+        if not records:
+            return
+        _lock(model)
+        pk = (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        self.first_pks.setdefault(source_model, pk)
+        objects = []
+        for record in records:
+            obj = build(record)
+            obj.pk = pk
+            if 'id' in record:
+                self.ids[source_model][record['id']] = pk
+            objects.append(obj)
+            pk += 1
+        values = [[getattr(obj, name) for name in dates] for obj in objects]
+        model.objects.bulk_create(objects)
+        _reset_sequence(model)
+        if dates:
+            for obj, row in zip(objects, values):
+                for name, value in zip(dates, row):
+                    setattr(obj, name, value)
+            model.objects.bulk_update(objects, dates)
+
+    def _import_natural(self, model, source_model, key, records, build):
+        existing = dict(model.objects.filter(
+            **{f'{key}__in': [record[key] for record in records]}
+        ).values_list(key, 'pk'))
+        new = []
+        for record in records:
+            if record[key] in existing:
+                self.ids[source_model][record['id']] = existing[record[key]]
+                scope = PAGE_SCOPES[source_model]
+                self.scopes.add(f'{scope}:{record[key]}')
+            else:
+                new.append(record)
+        self._create(model, source_model, new, build)
+
+    def _import_user(self, records):
+        self._import_natural(
+            User, 'user', 'username', records, lambda r: User(
+                username=r['username'],
+                first_name=r.get('first_name', ''),
+                last_name=r.get('last_name', ''),
+                email=r.get('email', ''),
+                password=r.get('password') or '!',
+                date_joined=_parse_date(r.get('date_joined')),
+            ))
+
+    def _import_group(self, records):
+        self._import_natural(
+            Group, 'group', 'slug', records, lambda r: Group(
+                slug=r['slug'],
+                title=r['title'],
+                description=r.get('description', ''),
+            ))
+
+    def _import_post(self, records):
+        def build(record):
+            pub_date = _parse_date(record.get('pub_date'))
+            return Post(
+                author_id=self._ref('user', record['author']),
+                group_id=self._ref('group', record.get('group')),
+                text=record['text'],
+                image=record.get('image') or '',
+                pub_date=pub_date,
+                updated=_parse_date(record.get('updated')) or pub_date,
+            )
+        self._create(Post, 'post', records, build, ('pub_date', 'updated'))
+
+    def _import_comment(self, records):
+        self._create(Comment, 'comment', records, lambda r: Comment(
+            post_id=self._ref('post', r['post']),
+            author_id=self._ref('user', r['author']),
+            text=r['text'],
+            created=_parse_date(r.get('created')),
+        ), ('created',))
+
+    def _import_follow(self, records):
+        follows = []
+        for record in records:
+            user_id = self._ref('user', record['user'])
+            author_id = self._ref('user', record['author'])
+            if user_id != author_id:
+                follows.append(Follow(user_id=user_id, author_id=author_id))
+        Follow.objects.bulk_create(
+            follows, ignore_conflicts=True)
+        follow_graph.forget(follow.user_id for follow in follows)
+
+
+def _parse_date(value):
+    if not value:
+        return timezone.now()
+    date = parse_datetime(value)
+    if date is None:
+        raise TransferError(f'Неверная дата: {value!r}')
+    if timezone.is_naive(date):
+        date = timezone.make_aware(date, timezone.utc)
+    return date
+
+
+def import_jsonl(stream, batch_size=BATCH_SIZE):
+    """Читает JSONL из stream; возвращает число объектов по моделям."""
+    importer = Importer(batch_size)
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            importer.add(json.loads(line))
+        except (KeyError, ValueError) as error:
+            raise TransferError(f'Строка {number}: {error}') from error
+    return importer.finish()
@@ -7,9 +7,17 @@ from django.conf.urls.static import static
 app_name = 'posts'
 urlpatterns = [
     path('', views.index, name='index'),
+    path('feed/<str:kind>/', views.index_feed, name='index_feed'),
     path('group/<slug:slug>/', views.group_list, name='group_list'),
+    path('group/<slug:slug>/feed/<str:kind>/',
+         views.group_feed, name='group_feed'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path('profile/<str:username>/feed/<str:kind>/',
+         views.profile_feed, name='profile_feed'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/<int:post_id>/comments/',
+         views.post_comments, name='post_comments'),
+    path('search/', views.post_search, name='search'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:pk>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/comment/',
@@ -1,20 +1,50 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.core.paginator import Paginator
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.views.decorators.http import condition
 
+from core.decorators import query_budget
+from . import (
+    counters, feed, follow_graph, freshness, search, syndication, thumbnails,
+)
+from .cache import versioned_cache_page
 from .forms import PostForm, CommentForm
-from .models import Post, Group, User, Follow
+from .models import Comment, Post, Group, User, Follow
+from .paginators import CursorPaginator
 
 POSTS_SHOWN = 10
+COMMENTS_SHOWN = 20
 
 
-@cache_page(20, key_prefix='index_page')
-def index(request):
-    post_list = Post.objects.all().order_by('-pub_date')
-    paginator = Paginator(post_list, POSTS_SHOWN)
+def get_page_obj(request, posts, count=None):
+    """Страница постов по курсору; ?page=N оставлен для старых ссылок.
+
+    count - хранимое число постов, чтобы Paginator не делал COUNT(*).
+    """
     page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    if page_number is not None:
+        paginator = Paginator(posts, POSTS_SHOWN)
+        if count is not None:
+            paginator.count = count
+        return paginator.get_page(page_number)
+    paginator = CursorPaginator(posts, POSTS_SHOWN)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def get_comments_page(post_id, cursor=None):
+    """Страница комментариев поста по курсору (created, id)."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author').order_by('created', 'pk')
+    return CursorPaginator(comments, COMMENTS_SHOWN).get_page(cursor)
+
+
+@versioned_cache_page('index_page', lambda request: ['posts'])
+@query_budget(4)
+def index(request):
+    post_list = Post.objects.select_related(
+        'author', 'group').order_by('-pub_date', '-pk')
+    page_obj = get_page_obj(request, post_list)
     author = Post.author
     context = {
         'page_obj': page_obj,
@@ -23,12 +53,13 @@ def index(request):
     return render(request, 'posts/index.html', context)
 
 
+@query_budget(5)
+@condition(etag_func=freshness.group_etag)
 def group_list(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.select_related('group').filter(group=group)
-    paginator = Paginator(posts, POSTS_SHOWN)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = Post.objects.select_related('author', 'group').filter(
+        group=group).order_by('-pub_date', '-pk')
+    page_obj = get_page_obj(request, posts, count=group.posts_count)
     title = group.title
     description = group.description
     context = {
@@ -41,14 +72,17 @@ def group_list(request, slug):
     return render(request, 'posts/group_list.html', context)
 
 
+@query_budget(6)
+@condition(etag_func=freshness.profile_etag)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, POSTS_SHOWN)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    following = (request.user.is_authenticated and Follow.objects.filter(
-        user=request.user, author=author).exists())
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    stats = counters.stats_for(author)
+    posts = author.posts.select_related('group').order_by(
+        '-pub_date', '-pk')
+    page_obj = get_page_obj(request, posts, count=stats.posts_count)
+    following = (request.user.is_authenticated
+                 and follow_graph.is_following(request.user.pk, author.pk))
     context = {
         'page_obj': page_obj,
         'author': author,
@@ -58,20 +92,87 @@ def profile(request, username):
     return render(request, 'posts/profile.html', context)
 
 
+@query_budget(6)
+@condition(etag_func=freshness.post_etag)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), pk=post_id)
     title = f'Пост {post.text}'
     form = CommentForm(request.POST or None)
-    comments = post.comments.all()
     context = {
         'title': title,
         'post': post,
         'form': form,
-        'comments': comments,
+        'comments': get_comments_page(post.pk),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@query_budget(1)
+def post_comments(request, post_id):
+    """Следующая пачка комментариев фрагментом HTML для post_detail."""
+    context = {
+        'post_id': post_id,
+        'comments': get_comments_page(post_id, request.GET.get('cursor')),
+    }
+    return render(request, 'includes/comment_list.html', context)
+
+
+@query_budget(6)
+def post_search(request):
+    query = request.GET.get('q', '').strip()
+    expression = search.match_expression(query)
+    group = author = page_obj = None
+    if request.GET.get('group'):
+        group = get_object_or_404(Group, slug=request.GET['group'])
+    if request.GET.get('author'):
+        author = get_object_or_404(User, username=request.GET['author'])
+    if expression is not None and search.is_available():
+        paginator = search.SearchPaginator(
+            expression, POSTS_SHOWN,
+            group_id=group and group.pk,
+            author_id=author and author.pk,
+        )
+        page_obj = paginator.get_page(request.GET.get('cursor'))
+    context = {
+        'query': query,
+        'group': group,
+        'author': author,
+        'page_obj': page_obj,
+    }
+    return render(request, 'posts/search.html', context)
+
+
+@syndication.feed_condition(lambda: 'posts')
+def index_feed(request, kind):
+    meta = syndication.FeedMeta(
+        request, 'Последние обновления на сайте',
+        reverse('posts:index'), Post.objects.all())
+    return syndication.response(kind, meta)
+
+
+@syndication.feed_condition(
+    lambda slug: f'group:{slug}',
+    lambda slug: Group.objects.filter(slug=slug).exists())
+def group_feed(request, slug, kind):
+    group = get_object_or_404(Group, slug=slug)
+    meta = syndication.FeedMeta(
+        request, group.title, reverse('posts:group_list', args=[slug]),
+        group.posts.all(), description=group.description)
+    return syndication.response(kind, meta)
+
+
+@syndication.feed_condition(
+    lambda username: f'author:{username}',
+    lambda username: User.objects.filter(username=username).exists())
+def profile_feed(request, username, kind):
+    author = get_object_or_404(User, username=username)
+    meta = syndication.FeedMeta(
+        request, f'Посты {syndication.author_name(author)}',
+        reverse('posts:profile', args=[username]), author.posts.all())
+    return syndication.response(kind, meta)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST or None,
@@ -80,6 +181,7 @@ def post_create(request):
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.schedule(post)
         return redirect('post:profile', username=request.user)
     else:
         form = PostForm()
@@ -97,7 +199,9 @@ def post_edit(request, pk):
         instance=post
     )
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            thumbnails.schedule(post)
         return redirect('posts:post_detail', post_id=pk)
     context = {
         'post': post,
@@ -120,11 +224,11 @@ def add_comment(request, post_id):
 
 
 @login_required
+@query_budget(5)
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(posts, POSTS_SHOWN)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    posts = feed.feed_posts(request.user.pk).select_related(
+        'author', 'group')
+    page_obj = get_page_obj(request, posts)
     context = {
         'page_obj': page_obj,
     }
@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_asgi_application()
+
+# Шаблоны, URL и движок миниатюр - до первого запроса
+from core.warmup import warmup_on_startup  # noqa: E402
+
+warmup_on_startup()
@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -34,11 +35,31 @@ ALLOWED_HOSTS = [
 ]
 
 # Cash data
+# Общий для всех воркеров кэш в файле SQLite (core/cache.py)
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_PATH', os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 2 ** 20,
+        },
     }
 }
+# manage.py test и pytest
+TESTING = sys.argv[1:2] == ['test'] or 'pytest' in sys.modules
+if TESTING:
+    # Тесты не трогают файл кэша разработки: у каждого тестового
+    # процесса свой кэш в памяти, и параллельные прогоны не мешают
+    # друг другу.
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'yatube-tests',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
 # Application definition
 
 INSTALLED_APPS = [
@@ -62,8 +83,23 @@ MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Картинки постов при загрузке уменьшаются до этого размера
+# и пересжимаются с этим качеством (JPEG, WebP)
+POST_IMAGE_MAX_SIZE = (1920, 1920)
+POST_IMAGE_QUALITY = 85
+
+# Потоки, создающие миниатюры картинок постов; 0 - сразу в запросе
+POST_THUMBNAIL_WORKERS = 2
+
+# Превышение query_budget: True - исключение, False - warning в лог
+QUERY_BUDGET_STRICT = False
+
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
+    'core.template_profiler.TemplateProfilerMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.db_routing.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -72,15 +108,42 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Метрики страниц (core/metrics.py): каталог снимков процессов
+# для /metrics и токен, с которым /metrics отдаётся
+# (Authorization: Bearer <токен>); без токена /metrics выключен
+METRICS_DIR = os.environ.get('YATUBE_METRICS_DIR')
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN')
+
+# Журнал медленных запросов к базе (core/slow_queries.py): файл JSONL,
+# порог в миллисекундах и ротация; без файла журнал выключен
+SLOW_QUERY_LOG = os.environ.get('YATUBE_SLOW_QUERY_LOG')
+SLOW_QUERY_MS = float(os.environ.get('YATUBE_SLOW_QUERY_MS', 100))
+SLOW_QUERY_LOG_MAX_BYTES = 10 * 2 ** 20
+SLOW_QUERY_LOG_BACKUPS = 5
+
+# Профиль рендера шаблонов (core/template_profiler.py): каталог для
+# requests.jsonl и templates.folded; без него профиль выключен
+TEMPLATE_PROFILE_DIR = os.environ.get('YATUBE_TEMPLATE_PROFILE_DIR')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Скомпилированные шаблоны хранятся в памяти процесса (cached.Loader)
+# без DEBUG или с YATUBE_TEMPLATE_CACHE=1; при DEBUG без кэша правки
+# шаблонов видны без перезапуска. Прогрев - core/warmup.py
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+if os.environ.get('YATUBE_TEMPLATE_CACHE', str(int(not DEBUG))) == '1':
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'core.backends.templates.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -98,11 +161,40 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Соединения с базой живут столько секунд и переиспользуются запросами
+# одного потока; 0 - новое соединение на каждый запрос
+CONN_MAX_AGE = int(os.environ.get('YATUBE_CONN_MAX_AGE', 60))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': str(BASE_DIR / 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+    },
+    # Копия default для чтения, её обновляет sync_replica
+    'replica': {
+        'ENGINE': 'core.backends.sqlite3',
+        'NAME': os.environ.get(
+            'YATUBE_REPLICA_PATH', str(BASE_DIR / 'db.replica.sqlite3')),
+        'CONN_MAX_AGE': CONN_MAX_AGE,
+    },
+}
+
+# Чтения GET-запросов идут на эту базу (core/db_routing.py);
+# None - всё читается из default
+DATABASE_REPLICA = 'replica' if os.environ.get('YATUBE_REPLICA_PATH') else None
+DATABASE_ROUTERS = ['core.db_routing.ReplicaRouter']
+
+# PRAGMA для каждого нового соединения с SQLite и режим BEGIN
+# транзакций (core/backends/sqlite3)
+SQLITE_TRANSACTION_MODE = 'IMMEDIATE'
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'mmap_size': 256 * 2 ** 20,
+    # Отрицательное значение - размер в КиБ, а не в страницах
+    'cache_size': -64 * 1024,
 }
 
 
@@ -3,12 +3,15 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from core.views import prometheus_metrics
+
 urlpatterns = [
     path('', include('posts.urls', namespace='post')),
     path('about/', include('about.urls', namespace='about')),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Шаблоны, URL и движок миниатюр - до первого запроса
+from core.warmup import warmup_on_startup  # noqa: E402
+
+warmup_on_startup()